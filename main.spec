@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=['sysinfo', 'remote', 'external', 'jobs', 'listing', 'walker', 'diskusage', 'finder', 'locate', 'textsearch', 'headtail', 'fileops', 'wordcount', 'sorting'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
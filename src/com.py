@@ -1,131 +1,167 @@
 import os
-import subprocess
 import sys
-import platform
-import json
-import tarfile
-import zipfile
-import urllib.request
-import shutil
-import psutil
-import datetime
-import math
-from pathlib import Path
+import importlib
+import functools
+from _thread import _local as thread_local  # threading.local, without importing threading
+
+# Everything else (subprocess, shutil, datetime, platform, pathlib, ...) is
+# imported inside the command that needs it, keeping time-to-prompt low.
 
 class TerminalCommands:
+    # Built-ins implemented in their own modules, as name -> (module, function).
+    # The module is imported the first time one of its commands runs, so
+    # sessions that never call them don't pay for psutil/urllib/zipfile.
+    LAZY_COMMANDS = {
+        "ls": ("listing", "ls"),
+        "neofetch": ("sysinfo", "neofetch"),
+        "df": ("sysinfo", "df"),
+        "ps": ("sysinfo", "ps"),
+        "git_clone": ("remote", "git_clone"),
+        "download_release": ("remote", "download_release"),
+        "du": ("diskusage", "du"),
+        "find": ("finder", "find"),
+        "updatedb": ("locate", "updatedb"),
+        "locate": ("locate", "locate"),
+        "hash": ("external", "hash_table"),
+        "jobs": ("jobs", "jobs"),
+        "fg": ("jobs", "fg"),
+        "wait": ("jobs", "wait"),
+        "grep": ("textsearch", "grep"),
+        "head": ("headtail", "head"),
+        "tail": ("headtail", "tail"),
+        "cp": ("fileops", "cp"),
+        "rm": ("fileops", "rm"),
+        "mv": ("fileops", "mv"),
+        "wc": ("wordcount", "wc"),
+        "sort": ("sorting", "sort"),
+    }
+    # Lazy built-ins that are passed the previous pipeline stage's output
+    LAZY_STDIN_COMMANDS = {"grep", "head", "tail", "wc", "sort"}
+    
     def __init__(self):
-        self.hostname = platform.node()
+        self.hostname = self._get_hostname()
         self.username = os.getenv('USER', 'user')
         self.current_dir = os.getcwd()
         self.home_dir = os.path.expanduser('~')
-        self.command_history = []
-        
+        self.data_dir = os.path.join(self.home_dir, '.winterm')
+        self.command_history = None  # history.History, loaded on first use
+        self._thread_state = thread_local()
+        self.job_table = None
+        self._exit_warned = False
+        self.commands = {}
+        self.stdin_commands = set()
+        
+        for name in ("cd", "pwd", "echo", "mkdir",
+                     "touch", "clear", "whoami", "date", "uname", "kill", "history", "help", "exit"):
+            self.register(name, getattr(self, name))
+        for name in ("cat",):
+            self.register(name, getattr(self, name), stdin=True)
+        self.register("cls", self.clear)
+        for name, (module, function) in self.LAZY_COMMANDS.items():
+            self.register_lazy(name, module, function, stdin=name in self.LAZY_STDIN_COMMANDS)
+        
+    @property
+    def last_status(self):
+        """Exit status of the last command run on this thread"""
+        return getattr(self._thread_state, 'last_status', 0)
+    
+    @last_status.setter
+    def last_status(self, status):
+        self._thread_state.last_status = status
+    
+    @property
+    def cancel_token(self):
+        """CancelToken of the pipeline running on this thread, if any"""
+        return getattr(self._thread_state, 'cancel_token', None)
+    
+    @cancel_token.setter
+    def cancel_token(self, token):
+        self._thread_state.cancel_token = token
+    
+    @property
+    def tty_output(self):
+        """True when the running built-in's output goes straight to a terminal"""
+        return getattr(self._thread_state, 'tty_output', False)
+    
+    @tty_output.setter
+    def tty_output(self, value):
+        self._thread_state.tty_output = value
+    
+    def cancelled(self):
+        """True once the running command has been interrupted or timed out"""
+        token = self.cancel_token
+        return token is not None and token.is_set()
+    
+    def _get_hostname(self):
+        """Get host name without importing platform/socket"""
+        if hasattr(os, 'uname'):
+            return os.uname().nodename
+        return os.environ.get('COMPUTERNAME') or os.environ.get('HOSTNAME', 'localhost')
+    
     def print_prompt(self):
         """Print terminal prompt"""
         dir_display = self.current_dir.replace(self.home_dir, '~')
         return f"{self.username}@{self.hostname}:{dir_display}$ "
     
-    def execute(self, command, *args):
-        """Execute terminal command"""
-        self.command_history.append(f"{command} {' '.join(args)}".strip())
-        
-        if command == "ls":
-            return self.ls(*args)
-        elif command == "cd":
-            return self.cd(*args)
-        elif command == "pwd":
-            return self.pwd()
-        elif command == "cat":
-            return self.cat(*args)
-        elif command == "echo":
-            return self.echo(*args)
-        elif command == "mkdir":
-            return self.mkdir(*args)
-        elif command == "rm":
-            return self.rm(*args)
-        elif command == "cp":
-            return self.cp(*args)
-        elif command == "mv":
-            return self.mv(*args)
-        elif command == "touch":
-            return self.touch(*args)
-        elif command == "clear" or command == "cls":
-            return self.clear()
-        elif command == "neofetch":
-            return self.neofetch()
-        elif command == "whoami":
-            return self.whoami()
-        elif command == "date":
-            return self.date()
-        elif command == "uname":
-            return self.uname(*args)
-        elif command == "df":
-            return self.df(*args)
-        elif command == "du":
-            return self.du(*args)
-        elif command == "find":
-            return self.find(*args)
-        elif command == "grep":
-            return self.grep(*args)
-        elif command == "ps":
-            return self.ps()
-        elif command == "kill":
-            return self.kill(*args)
-        elif command == "history":
-            return self.history()
-        elif command == "git_clone":
-            return self.git_clone(*args)
-        elif command == "download_release":
-            return self.download_release(*args)
-        elif command == "help":
-            return self.help()
-        elif command == "exit":
-            sys.exit(0)
-        else:
-            # Try to execute as system command
-            try:
-                result = subprocess.run([command] + list(args), 
-                                      capture_output=True, 
-                                      text=True,
-                                      cwd=self.current_dir)
-                if result.stdout:
-                    return result.stdout
-                elif result.stderr:
-                    return f"Error: {result.stderr}"
-            except FileNotFoundError:
-                return f"Command not found: {command}"
-    
-    def ls(self, *args):
-        """List directory contents"""
-        path = self.current_dir
-        if args and not args[0].startswith('-'):
-            path = os.path.join(self.current_dir, args[0])
-        
-        show_all = '-a' in args
-        long_format = '-l' in args
-        
-        try:
-            items = os.listdir(path)
-            if not show_all:
-                items = [item for item in items if not item.startswith('.')]
-            
-            if long_format:
-                output = []
-                for item in items:
-                    item_path = os.path.join(path, item)
-                    stat = os.stat(item_path)
-                    size = stat.st_size
-                    mtime = datetime.datetime.fromtimestamp(stat.st_mtime)
-                    is_dir = os.path.isdir(item_path)
-                    perm = oct(stat.st_mode)[-3:]
-                    
-                    type_char = 'd' if is_dir else '-'
-                    output.append(f"{type_char}{perm} {size:8} {mtime:%b %d %H:%M} {item}")
-                return "\n".join(output)
-            else:
-                return "  ".join(items)
-        except FileNotFoundError:
-            return f"ls: cannot access '{path}': No such file or directory"
+    def register(self, name, handler, stdin=False):
+        """Register a built-in command handler
+
+        Handlers registered with stdin=True are passed the previous pipeline
+        stage's output as a `stdin` keyword argument (an iterator of chunks).
+        """
+        self.commands[name] = handler
+        if stdin:
+            self.stdin_commands.add(name)
+    
+    def register_lazy(self, name, module, function, stdin=False):
+        """Register a built-in whose module is imported on first use"""
+        def load(*args, **kwargs):
+            func = getattr(importlib.import_module(module), function)
+            handler = functools.partial(func, self)
+            self.commands[name] = handler
+            return handler(*args, **kwargs)
+        self.commands[name] = load
+        if stdin:
+            self.stdin_commands.add(name)
+    
+    @property
+    def error_output(self):
+        """Binary file the running built-in's errors are redirected to (2>), if any"""
+        return getattr(self._thread_state, 'error_output', None)
+    
+    @error_output.setter
+    def error_output(self, target):
+        self._thread_state.error_output = target
+    
+    def error(self, message, status=1):
+        """Mark the running command as failed and return its error message
+
+        If the command's stderr is redirected, the message is written there
+        instead and an empty string is returned.
+        """
+        self.last_status = status
+        target = self.error_output
+        if target is not None:
+            from pipeline import text_encoding
+            target.write((message + "\n").encode(text_encoding()))
+            return ""
+        return message
+    
+    def error_line(self, message, status=1):
+        """error() for a message yielded as a line of output"""
+        message = self.error(message, status)
+        return message + "\n" if message else ""
+    
+    def load_history(self):
+        """Get the persistent command history, loading it on first use"""
+        if self.command_history is None:
+            from history import History
+            self.command_history = History.open(self.data_dir)
+        return self.command_history
+    
+    def add_history(self, line):
+        """Record a command line in the history"""
+        self.load_history().append(line)
     
     def cd(self, *args):
         """Change directory"""
@@ -146,33 +182,99 @@ class TerminalCommands:
         try:
             if os.path.isdir(new_dir):
                 self.current_dir = os.path.abspath(new_dir)
+                # Keep the process cwd in step so children can be spawned directly
+                os.chdir(self.current_dir)
                 return ""
             else:
-                return f"cd: {path}: No such file or directory"
+                return self.error(f"cd: {path}: No such file or directory")
         except Exception as e:
-            return f"cd: {e}"
+            return self.error(f"cd: {e}")
     
-    def pwd(self):
+    def pwd(self, *args):
         """Print working directory"""
         return self.current_dir
     
-    def cat(self, *args):
+    def cat(self, *args, stdin=None):
         """Concatenate and display files"""
-        if not args:
-            return "cat: missing operand"
-        
-        output_lines = []
-        for filename in args:
+        flags = set()
+        filenames = []
+        for arg in args:
+            if arg.startswith('-') and len(arg) > 1:
+                flags.update(arg[1:])
+            else:
+                filenames.append(arg)
+        unknown = flags - set('nA')
+        if unknown:
+            return self.error(f"cat: invalid option -- '{sorted(unknown)[0]}'")
+        
+        if not filenames:
+            if stdin is None:
+                return self.error("cat: missing operand")
+            if not flags:
+                return stdin
+            from pipeline import iter_byte_lines
+            import itertools
+            return self._cat_lines(iter_byte_lines(stdin), flags, itertools.count(1))
+        return self._cat_files(filenames, flags)
+    
+    def _cat_files(self, filenames, flags):
+        """Stream files as FileRegions (copied with sendfile), or transformed lines for -n/-A"""
+        import stat
+        import itertools
+        from pipeline import FileRegion, CHUNK_SIZE
+        
+        numbers = itertools.count(1)  # -n numbers lines across all files
+        for filename in filenames:
             filepath = os.path.join(self.current_dir, filename)
             try:
-                with open(filepath, 'r') as f:
-                    output_lines.append(f.read())
-            except FileNotFoundError:
-                return f"cat: {filename}: No such file or directory"
-            except IsADirectoryError:
-                return f"cat: {filename}: Is a directory"
-        
-        return "\n".join(output_lines)
+                f = open(filepath, 'rb')
+            except OSError as e:
+                yield self.error_line(f"cat: {filename}: {e.strerror}")
+                continue
+            with f:
+                st = os.fstat(f.fileno())
+                if stat.S_ISDIR(st.st_mode):
+                    yield self.error_line(f"cat: {filename}: Is a directory")
+                elif flags:
+                    yield from self._cat_lines(f, flags, numbers)
+                elif stat.S_ISREG(st.st_mode) and st.st_size:
+                    yield FileRegion(f, 0, st.st_size)
+                else:
+                    # Pipes, devices and /proc files have no useful size
+                    while True:
+                        chunk = f.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        yield chunk
+    
+    def _cat_lines(self, lines, flags, numbers):
+        """Apply -n (number lines) and -A (show non-printing characters) to byte lines"""
+        show_all = 'A' in flags
+        number = 'n' in flags
+        if show_all:
+            import re
+            # Like cat -vET: ^X for control characters, M- for high bytes, $ at line ends
+            def caret(byte):
+                prefix = b"M-" if byte >= 128 else b""
+                byte &= 0x7f
+                return prefix + (b"^?" if byte == 127 else b"^" + bytes([byte + 64]) if byte < 32 else bytes([byte]))
+            table = {byte: caret(byte) for byte in [*range(0, 10), *range(11, 32), *range(127, 256)]}
+            special = re.compile(rb"[\x00-\x09\x0b-\x1f\x7f-\xff]")
+            escape = lambda match: table[match.group()[0]]
+        
+        batch = []
+        for line in lines:
+            if show_all:
+                newline = line.endswith(b"\n")
+                line = special.sub(escape, line[:-1] if newline else line) + (b"$\n" if newline else b"")
+            if number:
+                line = b"%6d\t" % next(numbers) + line
+            batch.append(line)
+            if len(batch) >= 1000:
+                yield b"".join(batch)
+                batch = []
+        if batch:
+            yield b"".join(batch)
     
     def echo(self, *args):
         """Display text"""
@@ -181,227 +283,43 @@ class TerminalCommands:
     def mkdir(self, *args):
         """Make directories"""
         if not args:
-            return "mkdir: missing operand"
+            return self.error("mkdir: missing operand")
         
         for dirname in args:
             try:
                 os.makedirs(os.path.join(self.current_dir, dirname), exist_ok=True)
             except Exception as e:
-                return f"mkdir: {e}"
-        return ""
-    
-    def rm(self, *args):
-        """Remove files/directories"""
-        if not args:
-            return "rm: missing operand"
-        
-        recursive = '-r' in args or '-rf' in args
-        args = [arg for arg in args if not arg.startswith('-')]
-        
-        for target in args:
-            target_path = os.path.join(self.current_dir, target)
-            try:
-                if os.path.isdir(target_path):
-                    if recursive:
-                        shutil.rmtree(target_path)
-                    else:
-                        return f"rm: {target}: is a directory"
-                else:
-                    os.remove(target_path)
-            except FileNotFoundError:
-                return f"rm: cannot remove '{target}': No such file or directory"
-            except Exception as e:
-                return f"rm: {e}"
-        return ""
-    
-    def cp(self, *args):
-        """Copy files"""
-        if len(args) < 2:
-            return "cp: missing operand"
-        
-        source = os.path.join(self.current_dir, args[0])
-        dest = os.path.join(self.current_dir, args[1])
-        
-        try:
-            if os.path.isdir(source):
-                if os.path.exists(dest):
-                    dest = os.path.join(dest, os.path.basename(source))
-                shutil.copytree(source, dest)
-            else:
-                shutil.copy2(source, dest)
-        except FileNotFoundError:
-            return f"cp: cannot stat '{args[0]}': No such file or directory"
-        except Exception as e:
-            return f"cp: {e}"
-        return ""
-    
-    def mv(self, *args):
-        """Move/rename files"""
-        if len(args) < 2:
-            return "mv: missing operand"
-        
-        source = os.path.join(self.current_dir, args[0])
-        dest = os.path.join(self.current_dir, args[1])
-        
-        try:
-            shutil.move(source, dest)
-        except FileNotFoundError:
-            return f"mv: cannot stat '{args[0]}': No such file or directory"
-        except Exception as e:
-            return f"mv: {e}"
+                return self.error(f"mkdir: {e}")
         return ""
     
     def touch(self, *args):
         """Create empty files"""
+        from pathlib import Path
         for filename in args:
             try:
                 filepath = os.path.join(self.current_dir, filename)
                 Path(filepath).touch()
             except Exception as e:
-                return f"touch: {e}"
+                return self.error(f"touch: {e}")
         return ""
     
-    def clear(self):
+    def clear(self, *args):
         """Clear terminal screen"""
         os.system('cls' if os.name == 'nt' else 'clear')
         return ""
     
-    def neofetch(self):
-        """Display system information"""
-        system_info = platform.uname()
-        
-        # Get CPU information
-        cpu_info = platform.processor()
-        if not cpu_info:
-            cpu_info = "Unknown"
-        
-        # Get memory information
-        memory = psutil.virtual_memory()
-        mem_total = memory.total / (1024**3)
-        mem_used = memory.used / (1024**3)
-        
-        # Get disk information
-        disk = psutil.disk_usage('/')
-        disk_total = disk.total / (1024**3)
-        disk_used = disk.used / (1024**3)
-        
-        info = f"""
-               {self.username}@{self.hostname}
-               ---------------
-               OS: {system_info.system} {system_info.release}
-               Kernel: {system_info.version.split('#')[0]}
-               Uptime: {self._get_uptime()}
-               Shell: {os.environ.get('SHELL', 'Unknown')}
-               Terminal: {os.environ.get('TERM', 'Unknown')}
-               CPU: {cpu_info}
-               Memory: {mem_used:.1f}GiB / {mem_total:.1f}GiB
-               Disk: {disk_used:.1f}GiB / {disk_total:.1f}GiB
-        """
-        
-        # Add ASCII art based on OS
-        ascii_art = self._get_ascii_art(system_info.system)
-        
-        return ascii_art + info
-    
-    def _get_uptime(self):
-        """Get system uptime"""
-        try:
-            with open('/proc/uptime', 'r') as f:
-                uptime_seconds = float(f.readline().split()[0])
-            
-            days = uptime_seconds // 86400
-            hours = (uptime_seconds % 86400) // 3600
-            minutes = (uptime_seconds % 3600) // 60
-            
-            if days > 0:
-                return f"{int(days)} days, {int(hours)} hours"
-            elif hours > 0:
-                return f"{int(hours)} hours, {int(minutes)} mins"
-            else:
-                return f"{int(minutes)} mins"
-        except:
-            return "Unknown"
-    
-    def _get_ascii_art(self, os_name):
-        """Get ASCII art for the OS"""
-        arts = {
-            "Linux": """
-                   .88888888:.
-                88888888.88888.
-              .8888888888888888.
-              888888888888888888
-              88' _`88'_  `88888
-              88 88 88 88  88888
-              88_88_::_88_:88888
-              88:::,::,:::::8888
-              88`:::::::::'`8888
-             .88  `::::'    8:88.
-            8888            `8:888.
-          .8888'             `888888.
-         .8888:..  .::.  ...:'8888888:.
-        .8888.'     :'     `'::`88:88888
-       .8888        '         `.888:8888.
-      888:8         .           888:88888
-    .888:88        .:           888:88888:
-    8888888.       ::           88:888888
-    `.::.888.      ::          .88888888
-   .::::::.888.    ::         :::`8888'.:.
-  ::::::::::.888   '         .::::::::::::
-  ::::::::::::.8    '      .:8::::::::::::.
- .::::::::::::::.        .:888:::::::::::::
- :::::::::::::::88:.__..:88888:::::::::::'
-  `'.:::::::::::88888888888.88:::::::::'
-        `':::_:' -- '' -'-' `':_::::'`
-            """,
-            "Windows": """
-            ⠀⠀⠀⣤⣴⣾⣿⣿⣿⣿⣿⣶⡄⠀⠀⠀⠀⠀⠀⠀⠀⠀⣠⡄
-⠀⠀⢀⣿⣿⣿⣿⣿⣿⣿⣿⣿⠀⠀⢰⣦⣄⣀⣀⣠⣴⣾⣿⠃
-⠀⠀⢸⣿⣿⣿⣿⣿⣿⣿⣿⡏⠀⠀⣼⣿⣿⣿⣿⣿⣿⣿⣿⠀
-⠀⠀⣼⣿⡿⠿⠛⠻⠿⣿⣿⡇⠀⠀⣿⣿⣿⣿⣿⣿⣿⣿⡿⠀
-⠀⠀⠉⠀⠀⠀⢀⠀⠀⠀⠈⠁⠀⢰⣿⣿⣿⣿⣿⣿⣿⣿⠇⠀
-⠀⠀⣠⣴⣶⣿⣿⣿⣷⣶⣤⠀⠀⠀⠈⠉⠛⠛⠛⠉⠉⠀⠀⠀
-⠀⢸⣿⣿⣿⣿⣿⣿⣿⣿⡇⠀⠀⣶⣦⣄⣀⣀⣀⣤⣤⣶⠀⠀
-⠀⣾⣿⣿⣿⣿⣿⣿⣿⣿⡇⠀⢀⣿⣿⣿⣿⣿⣿⣿⣿⡟⠀⠀
-⠀⣿⣿⣿⣿⣿⣿⣿⣿⣿⠁⠀⢸⣿⣿⣿⣿⣿⣿⣿⣿⡇⠀⠀
-⢠⣿⡿⠿⠛⠉⠉⠉⠛⠿⠀⠀⢸⣿⣿⣿⣿⣿⣿⣿⣿⠁⠀⠀
-⠘⠉⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠻⢿⣿⣿⣿⣿⣿⠿⠛⠀⠀⠀
-        """,
-            "Darwin": """
-                    c.'
-                 ,xNMM.
-               .OMMMMo
-               lMM"
-     .;loddo:.  .olloddol;.
-   cKMMMMMMMMMMNWMMMMMMMMMM0:
- .KMMMMMMMMMMMMMMMMMMMMMMMWd.
- XMMMMMMMMMMMMMMMMMMMMMMMX.
-;MMMMMMMMMMMMMMMMMMMMMMMMM:
-:MMMMMMMMMMMMMMMMMMMMMMMMM:
-.MMMMMMMMMMMMMMMMMMMMMMMMX.
- kMMMMMMMMMMMMMMMMMMMMMMMMWd.
- 'XMMMMMMMMMMMMMMMMMMMMMMMMMMk
-  'XMMMMMMMMMMMMMMMMMMMMMMMMK.
-    kMMMMMMMMMMMMMMMMMMMMMMd
-     ;KMMMMMMMWXXWMMMMMMMk.
-       "cooc*"    "*coo'"
-            """
-        }
-        
-        return arts.get(os_name, """
-            OS not recognized
-               ⠀⠀⠀⠀
-        """)
-    
-    def whoami(self):
+    def whoami(self, *args):
         """Print current user"""
         return self.username
     
-    def date(self):
+    def date(self, *args):
         """Print current date and time"""
+        import datetime
         return datetime.datetime.now().strftime("%a %b %d %H:%M:%S %Y")
     
     def uname(self, *args):
         """Print system information"""
+        import platform
         system_info = platform.uname()
         
         if '-a' in args:
@@ -417,255 +335,62 @@ class TerminalCommands:
         else:
             return system_info.system
     
-    def df(self, *args):
-        """Display disk space usage"""
-        partitions = psutil.disk_partitions()
-        output = ["Filesystem      Size  Used  Avail  Use%  Mounted on"]
-        
-        for partition in partitions:
-            try:
-                usage = psutil.disk_usage(partition.mountpoint)
-                size_gb = usage.total / (1024**3)
-                used_gb = usage.used / (1024**3)
-                avail_gb = usage.free / (1024**3)
-                percent = usage.percent
-                
-                output.append(f"{partition.device[:14]:14} {size_gb:4.1f}G {used_gb:4.1f}G {avail_gb:4.1f}G {percent:4.0f}%  {partition.mountpoint}")
-            except:
-                continue
-        
-        return "\n".join(output)
-    
-    def du(self, *args):
-        """Estimate file space usage"""
-        path = self.current_dir
-        if args:
-            path = os.path.join(self.current_dir, args[0])
-        
-        try:
-            total_size = 0
-            for dirpath, dirnames, filenames in os.walk(path):
-                for f in filenames:
-                    fp = os.path.join(dirpath, f)
-                    if os.path.exists(fp):
-                        total_size += os.path.getsize(fp)
-            
-            # Convert to human readable format
-            for unit in ['B', 'K', 'M', 'G']:
-                if total_size < 1024.0:
-                    return f"{total_size:.1f}{unit}"
-                total_size /= 1024.0
-            return f"{total_size:.1f}T"
-        except Exception as e:
-            return f"du: {e}"
-    
-    def find(self, *args):
-        """Search for files"""
-        if len(args) < 2:
-            return "Usage: find [path] -name [pattern]"
-        
-        path = args[0]
-        pattern = args[2] if '-name' in args else '*'
-        
-        try:
-            results = []
-            for root, dirs, files in os.walk(os.path.join(self.current_dir, path)):
-                for name in files:
-                    if pattern in name:
-                        results.append(os.path.join(root, name))
-            return "\n".join(results) if results else "No files found"
-        except Exception as e:
-            return f"find: {e}"
-    
-    def grep(self, *args):
-        """Search text using patterns"""
-        if len(args) < 2:
-            return "Usage: grep [pattern] [file]"
-        
-        pattern = args[0]
-        filename = args[1]
-        filepath = os.path.join(self.current_dir, filename)
-        
-        try:
-            with open(filepath, 'r') as f:
-                lines = f.readlines()
-            
-            matches = []
-            for i, line in enumerate(lines, 1):
-                if pattern in line:
-                    matches.append(f"{i}: {line.strip()}")
-            
-            return "\n".join(matches) if matches else f"No matches found for '{pattern}'"
-        except FileNotFoundError:
-            return f"grep: {filename}: No such file or directory"
-    
-    def ps(self):
-        """Display process status"""
-        output = ["PID    CMD"]
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                output.append(f"{proc.info['pid']:<6} {proc.info['name']}")
-            except:
-                continue
-        
-        return "\n".join(output[:20])  # Show first 20 processes
-    
     def kill(self, *args):
         """Terminate processes"""
         if not args:
-            return "Usage: kill [pid]"
+            return self.error("Usage: kill [pid]")
         
         try:
             pid = int(args[0])
             os.kill(pid, 9)
             return f"Process {pid} terminated"
         except ProcessLookupError:
-            return f"kill: ({pid}) - No such process"
+            return self.error(f"kill: ({pid}) - No such process")
         except Exception as e:
-            return f"kill: {e}"
+            return self.error(f"kill: {e}")
     
-    def history(self):
-        """Show command history"""
-        return "\n".join([f"{i+1}  {cmd}" for i, cmd in enumerate(self.command_history[-20:])])
-    
-    def git_clone(self, *args):
-        """Clone a Git repository"""
+    def history(self, *args):
+        """Show or search command history"""
+        history = self.load_history()
         if not args:
-            return "Usage: git_clone [repository_url]"
-        
-        url = args[0]
-        repo_name = url.split('/')[-1]
-        if repo_name.endswith('.git'):
-            repo_name = repo_name[:-4]
-        
-        target_dir = os.path.join(self.current_dir, repo_name)
-        
-        try:
-            # For GitHub, we can use the API for public repos
-            if 'github.com' in url:
-                api_url = url.replace('github.com', 'api.github.com/repos').replace('.git', '')
-                if not api_url.startswith('http'):
-                    api_url = 'https://' + api_url
-                
-                # Get repository info
-                with urllib.request.urlopen(api_url) as response:
-                    repo_data = json.loads(response.read())
-                    default_branch = repo_data.get('default_branch', 'main')
-                    clone_url = repo_data.get('clone_url', url)
-                
-                # Download as zip
-                zip_url = f"{url.replace('.git', '')}/archive/refs/heads/{default_branch}.zip"
-                
-                print(f"Cloning into '{repo_name}'...")
-                zip_path = os.path.join(self.current_dir, f"{repo_name}.zip")
-                
-                # Download zip file
-                with urllib.request.urlopen(zip_url) as response, open(zip_path, 'wb') as out_file:
-                    shutil.copyfileobj(response, out_file)
-                
-                # Extract zip file
-                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(self.current_dir)
-                
-                # Remove zip file
-                os.remove(zip_path)
-                
-                # Rename extracted directory
-                extracted_dir = os.path.join(self.current_dir, f"{repo_name}-{default_branch}")
-                if os.path.exists(extracted_dir):
-                    if os.path.exists(target_dir):
-                        shutil.rmtree(target_dir)
-                    os.rename(extracted_dir, target_dir)
-                
-                return f"Repository cloned to {target_dir}"
-            else:
-                return "Currently only GitHub repositories are supported"
-        except Exception as e:
-            return f"Error cloning repository: {e}"
+            entries = history.tail(20)
+        elif args[0] in ('-s', '-p'):
+            if len(args) < 2 or not args[1]:
+                return self.error(f"history: {args[0]}: search text required")
+            entries = history.search(" ".join(args[1:]), prefix=args[0] == '-p')
+        elif args[0] == '-c':
+            history.clear()
+            return ""
+        elif args[0].isdigit():
+            entries = history.tail(int(args[0]))
+        else:
+            return self.error("Usage: history [N] [-s text] [-p prefix] [-c]")
+        return (f"{number}  {cmd}\n" for number, cmd in entries)
     
-    def download_release(self, *args):
-        """Download a GitHub release"""
-        if not args:
-            return "Usage: download_release [owner/repo] [tag?]"
-        
-        repo = args[0]
-        tag = args[1] if len(args) > 1 else 'latest'
-        
-        try:
-            if tag == 'latest':
-                api_url = f"https://api.github.com/repos/{repo}/releases/latest"
-            else:
-                api_url = f"https://api.github.com/repos/{repo}/releases/tags/{tag}"
-            
-            with urllib.request.urlopen(api_url) as response:
-                release_data = json.loads(response.read())
-            
-            # Find asset (prefer source code)
-            asset = None
-            for a in release_data.get('assets', []):
-                if 'source' in a['name'].lower() or 'src' in a['name'].lower():
-                    asset = a
-                    break
-            
-            if not asset and release_data.get('assets'):
-                asset = release_data['assets'][0]
-            
-            if asset:
-                download_url = asset['browser_download_url']
-                filename = asset['name']
-                
-                print(f"Downloading {filename}...")
-                filepath = os.path.join(self.current_dir, filename)
-                
-                with urllib.request.urlopen(download_url) as response, open(filepath, 'wb') as out_file:
-                    shutil.copyfileobj(response, out_file)
-                
-                # Extract if it's an archive
-                if filename.endswith('.zip'):
-                    with zipfile.ZipFile(filepath, 'r') as zip_ref:
-                        zip_ref.extractall(self.current_dir)
-                    os.remove(filepath)
-                    return f"Release extracted to {self.current_dir}"
-                elif filename.endswith('.tar.gz') or filename.endswith('.tgz'):
-                    with tarfile.open(filepath, 'r:gz') as tar_ref:
-                        tar_ref.extractall(self.current_dir)
-                    os.remove(filepath)
-                    return f"Release extracted to {self.current_dir}"
-                else:
-                    return f"Release downloaded to {filepath}"
-            else:
-                # Fallback to source code zip
-                source_url = f"https://github.com/{repo}/archive/refs/tags/{release_data['tag_name']}.zip"
-                filename = f"{repo.split('/')[1]}-{release_data['tag_name']}.zip"
-                
-                print(f"Downloading source code...")
-                filepath = os.path.join(self.current_dir, filename)
-                
-                with urllib.request.urlopen(source_url) as response, open(filepath, 'wb') as out_file:
-                    shutil.copyfileobj(response, out_file)
-                
-                with zipfile.ZipFile(filepath, 'r') as zip_ref:
-                    zip_ref.extractall(self.current_dir)
-                
-                os.remove(filepath)
-                return f"Source code extracted to {self.current_dir}"
-                
-        except Exception as e:
-            return f"Error downloading release: {e}"
+    def exit(self, *args):
+        """Exit terminal"""
+        if self.job_table and self.job_table.running() and not self._exit_warned:
+            self._exit_warned = True
+            return self.error("There are running jobs.")
+        sys.exit(int(args[0]) if args and args[0].isdigit() else 0)
     
-    def help(self):
+    def help(self, *args):
         """Display help information"""
         help_text = """
 Available commands:
-  ls [path] [-l] [-a]     - List directory contents
+  ls [path...] [-laStrUR1] - List directory contents (-S size, -t time, -r reverse, -R recursive)
   cd [path]               - Change directory
   pwd                     - Print working directory
-  cat [file...]           - Display file contents
+  cat [-nA] [file...]     - Display file contents (-n numbers lines, -A shows control chars)
+  head [-n N] [file...]   - Show the first N lines (default 10)
+  tail [-n [+]N] [-f] [file...] - Show the last N lines; -f follows files as they grow
+  wc [-lwmc] [file...]    - Count lines, words, characters and bytes
+  sort [-nru] [-t SEP] [-k POS1[,POS2]] [-S SIZE] [--parallel N] [file...] - Sort lines; spills to temp files beyond -S
   echo [text...]          - Display text
   mkdir [dir...]          - Create directories
-  rm [file...] [-r]       - Remove files/directories
-  cp [source] [dest]      - Copy files
-  mv [source] [dest]      - Move/rename files
+  rm [-rfv] [--one-file-system] path... - Remove files; -r removes trees in parallel
+  cp [-r] [--resume] source... dest - Copy files and trees in parallel (--resume skips unchanged files)
+  mv [--verify] source... dest - Move/rename; copies across filesystems (--verify checks SHA-256)
   touch [file...]         - Create empty files
   clear/cls               - Clear terminal screen
   neofetch                - Display system information
@@ -673,15 +398,23 @@ Available commands:
   date                    - Print date and time
   uname [-a]              - Print system information
   df                      - Display disk usage
-  du [path]               - Estimate file space usage
-  find [path] -name [pat] - Search for files
-  grep [pattern] [file]   - Search text in files
+  du [-sahx] [-d N] [path] - Disk usage per directory (--apparent-size, --top N, --cache)
+  find [path] [expr]      - Search for files (-name -type -size -mtime -prune -print0 ...)
+  updatedb [root...]      - Index file names for locate (default: last roots, or ~)
+  locate [-i] [-c] pat    - Find indexed paths containing pat (or matching a glob)
+  grep [-rivclnF] pat [file...] - Search files, directories (-r) or piped input for a regex
+  cmd | cmd ...           - Pipe output of one command into the next
+  cmd > file, >> file     - Write/append output to a file (2> for errors)
   ps                      - Display processes
   kill [pid]              - Terminate process
-  history                 - Show command history
+  history [N] [-s|-p txt] - Show or search command history (-c clears)
+  hash [-r] [-d name]     - Show or reset remembered command locations
+  cmd &                   - Run a command in the background
+  jobs / fg [n] / wait    - List, resume or wait for background jobs
+  timeout [secs] cmd      - Cancel a command after a time limit
   git_clone [url]         - Clone Git repository
   download_release [repo] [tag?] - Download GitHub release
   help                    - Show this help
-  exit                    - Exit terminal
+  exit [status]           - Exit terminal
         """
         return help_text
\ No newline at end of file
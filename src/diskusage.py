@@ -0,0 +1,341 @@
+"""du built-in: per-directory disk usage from a single traversal
+
+The tree is read once with walker.Walker. Each directory's own usage is
+summed as its entries arrive and subtree totals are rolled up afterwards,
+so `-d N`, `-a` and the largest-directories report never rescan anything.
+Hard-linked files are counted once, keyed on (st_dev, st_ino).
+
+With --cache, each directory's own usage, subdirectory names and mtime
+are kept in ~/.winterm/du.db. On the next run every directory is still
+stat()ed, but only those whose mtime changed are read again; the rest
+reuse their cached figures. A file that grows in place doesn't change its
+directory's mtime, so run without --cache for an exact recount. Directories
+holding hard-linked files are not cached: whether such a file is counted
+depends on which of its links the walk reaches first.
+"""
+import os
+import stat
+
+USAGE = "Usage: du [-s] [-a] [-h] [-x] [-d N] [--apparent-size] [--top N] [--cache] [path...]"
+CACHE_FILE = 'du.db'
+HAS_BLOCKS = hasattr(os.stat_result, 'st_blocks')  # not on Windows
+
+
+class Options:
+    """Parsed du command line"""
+    def __init__(self):
+        self.max_depth = None
+        self.all = False
+        self.human = False
+        self.apparent = False
+        self.one_filesystem = False
+        self.top = None
+        self.cache = False
+
+
+def parse_args(args):
+    """Return (Options, paths); raises ValueError on bad arguments"""
+    options = Options()
+    paths = []
+    args = list(args)
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        name, _, value = arg.partition('=')
+        if name in ('-d', '--max-depth', '--top'):
+            if not value:
+                if i >= len(args):
+                    raise ValueError(f"option '{name}' requires an argument")
+                value = args[i]
+                i += 1
+            if not value.isdigit():
+                raise ValueError(f"invalid number '{value}'")
+            if name == '--top':
+                options.top = int(value)
+            else:
+                options.max_depth = int(value)
+        elif arg == '--apparent-size':
+            options.apparent = True
+        elif arg == '--cache':
+            options.cache = True
+        elif arg.startswith('-') and len(arg) > 1 and not arg.startswith('--'):
+            for flag in arg[1:]:
+                if flag == 's':
+                    options.max_depth = 0
+                elif flag == 'a':
+                    options.all = True
+                elif flag == 'h':
+                    options.human = True
+                elif flag == 'x':
+                    options.one_filesystem = True
+                else:
+                    raise ValueError(f"invalid option -- '{flag}'")
+        elif arg.startswith('--'):
+            raise ValueError(f"unrecognized option '{arg}'")
+        else:
+            paths.append(arg)
+    return options, paths
+
+
+def human_size(size):
+    """Format a byte count like 1.5K, 20.0M"""
+    for unit in ['B', 'K', 'M', 'G']:
+        if size < 1024.0:
+            return f"{size:.1f}{unit}"
+        size /= 1024.0
+    return f"{size:.1f}T"
+
+
+def _blocks(size):
+    """Bytes as 1K blocks, rounded up"""
+    return str(-(-size // 1024))
+
+
+def du(term, *args):
+    """Estimate file space usage"""
+    try:
+        options, paths = parse_args(args)
+    except ValueError as e:
+        return term.error(f"du: {e}\n{USAGE}")
+    return _du(term, options, paths or ['.'])
+
+
+def _du(term, options, paths):
+    show = human_size if options.human else _blocks
+    cache = None
+    if options.cache:
+        try:
+            cache = SizeCache(os.path.join(term.data_dir, CACHE_FILE))
+        except Exception as e:
+            yield term.error_line(f"du: cache unavailable: {e}")
+    try:
+        yield from _report(term, options, paths, show, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def _report(term, options, paths, show, cache):
+    for path in paths:
+        full = os.path.normpath(os.path.join(term.current_dir, path))
+        usage = Usage(options)
+        try:
+            root = os.lstat(full)
+        except OSError as e:
+            yield term.error_line(f"du: cannot access '{path}': {e.strerror}")
+            continue
+        if not stat.S_ISDIR(root.st_mode):
+            yield f"{show(usage.size(root))}\t{path}\n"
+            continue
+
+        errors = usage.scan(full, term, cache)
+        if term.cancelled():
+            # Interrupted: the listing would be incomplete, so just report what was counted
+            total = usage.totals.get(full, 0)
+            yield f"{show(total)}\t{path} (partial: {term.cancel_token.reason})\n"
+            term.last_status = 130
+            return
+        if errors:
+            yield "".join(term.error_line(f"du: {message}") for message in errors)
+
+        if options.top is not None:
+            lines = [f"{show(size)}\t{path + directory[len(full):]}"
+                     for size, directory in usage.largest(options.top)]
+        else:
+            lines = (f"{show(size)}\t{path + name[len(full):]}"
+                     for name, size in usage.report())
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= 1000:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+
+class Usage:
+    """Disk usage of one tree, gathered in a single walk"""
+    def __init__(self, options):
+        self.options = options
+        self.own = {}        # directory -> bytes used by the directory and its files
+        self.depth = {}
+        self.children = {}   # directory -> subdirectories
+        self.files = {}      # directory -> [(path, bytes)], only for -a
+        self.totals = {}
+        self.root = None
+        self.seen = set()    # (st_dev, st_ino) of hard-linked files already counted
+        if options.apparent or not HAS_BLOCKS:
+            self.size = lambda st: st.st_size
+        else:
+            self.size = lambda st: st.st_blocks * 512
+
+    def scan(self, root, term, cache=None):
+        """Walk the tree under root; returns error messages for unreadable directories
+
+        With a SizeCache, directories whose mtime hasn't changed since the
+        last run are not read again.
+        """
+        from walker import Walker
+
+        self.root = root
+        self.depth[root] = 0
+        errors = []
+        keep_files = self.options.all
+        reuse = None
+        if cache is None:
+            # Each directory's own size is added by its parent, the root's here
+            self.own[root] = self.size(os.lstat(root))
+        else:
+            cached = cache.load(root)
+            mtimes = {}  # directory -> st_mtime_ns seen before it was read
+            rows = []    # directories read this time, to save
+            size_index = 1 if self.options.apparent or not HAS_BLOCKS else 2
+            # -a needs every file and -x may exclude cached subdirectories
+            reusable = not keep_files and not self.options.one_filesystem
+
+            def reuse(path):
+                # Runs on the walker's threads, which stat directories in parallel
+                try:
+                    st = os.lstat(path)
+                except OSError:
+                    return None  # let the walker report it
+                mtimes[path] = st.st_mtime_ns
+                self.own[path] = self.size(st)
+                row = cached.get(path)
+                if not reusable or row is None or row[0] != st.st_mtime_ns:
+                    return None
+                return [os.path.join(path, name) for name in row[3].split('\0') if name]
+
+        walker = Walker(root, stat=True, one_filesystem=self.options.one_filesystem,
+                        cancelled=term.cancelled, reuse=reuse)
+        for directory in walker:
+            path = directory.path
+            if directory.reused:
+                row = cached[path]
+                self.own[path] += row[size_index]
+                subdirs = [os.path.join(path, name) for name in row[3].split('\0') if name]
+                for child in subdirs:
+                    self.depth[child] = directory.depth + 1
+                self.children[path] = subdirs
+                continue
+            if directory.error is not None:
+                errors.append(f"cannot read directory '{path}': {directory.error.strerror}")
+                continue
+            total = 0
+            apparent = allocated = 0  # files only, for the cache
+            linked = False
+            subdirs = []
+            files = [] if keep_files else None
+            for entry in directory.entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue  # removed while walking
+                if stat.S_ISDIR(st.st_mode):
+                    subdirs.append(entry.path)
+                    self.depth[entry.path] = directory.depth + 1
+                    if cache is None:
+                        self.own[entry.path] = self.own.get(entry.path, 0) + self.size(st)
+                    continue
+                if st.st_nlink > 1:
+                    linked = True
+                    key = (st.st_dev, st.st_ino)
+                    if key in self.seen:
+                        continue
+                    self.seen.add(key)
+                size = self.size(st)
+                total += size
+                if cache is not None:
+                    apparent += st.st_size
+                    allocated += st.st_blocks * 512 if HAS_BLOCKS else st.st_size
+                if files is not None:
+                    files.append((entry.path, size))
+            self.own[path] = self.own.get(path, 0) + total
+            self.children[path] = subdirs
+            if files:
+                self.files[path] = files
+            if cache is not None and path in mtimes and not linked:
+                names = "\0".join(os.path.basename(child) for child in subdirs)
+                rows.append((path, mtimes[path], apparent, allocated, names))
+        self._roll_up()
+        if cache is not None:
+            # After a complete walk, cached directories that weren't seen are gone
+            stale = () if term.cancelled() else cached.keys() - self.depth.keys()
+            cache.store(rows, stale)
+        return errors
+
+    def _roll_up(self):
+        """Compute subtree totals, deepest directories first
+
+        After a cancelled walk some directories were counted before their
+        parent was reached (no depth yet) and some children never were;
+        both are left out of the partial totals.
+        """
+        totals = self.totals
+        depth = self.depth
+        for path in sorted((path for path in self.own if path in depth), key=depth.__getitem__, reverse=True):
+            totals[path] = self.own[path] + sum(totals.get(child, 0) for child in self.children.get(path, ()))
+
+    def report(self):
+        """Yield (path, bytes) in du order: contents before their directory"""
+        max_depth = self.options.max_depth
+        stack = [(self.root, False)]
+        while stack:
+            path, expanded = stack.pop()
+            depth = self.depth[path]
+            if expanded:
+                if self.options.all and (max_depth is None or depth < max_depth):
+                    yield from sorted(self.files.get(path, ()))
+                yield path, self.totals[path]
+                continue
+            if max_depth is not None and depth > max_depth:
+                continue
+            stack.append((path, True))
+            for child in sorted(self.children.get(path, ()), reverse=True):
+                stack.append((child, False))
+
+    def largest(self, count):
+        """The count largest directories as (bytes, path), largest first"""
+        import heapq
+        return heapq.nlargest(count, ((size, path) for path, size in self.totals.items()))
+
+
+class SizeCache:
+    """Per-directory usage remembered between runs (see the module docstring)"""
+    VERSION = 1  # bumped when rows saved by older versions can't be trusted
+
+    def __init__(self, path):
+        import sqlite3
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS dirs ("
+                        "path TEXT PRIMARY KEY, mtime INTEGER, bytes INTEGER, "
+                        "blocks INTEGER, subdirs TEXT) WITHOUT ROWID")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < self.VERSION:
+            # Older rows may include hard-linked files
+            with self.db:
+                self.db.execute("DELETE FROM dirs")
+                self.db.execute(f"PRAGMA user_version = {self.VERSION}")
+
+    def _subtree(self, root):
+        """SQL condition and parameters matching root and everything below it"""
+        prefix = root.rstrip(os.sep) + os.sep
+        end = prefix[:-1] + chr(ord(os.sep) + 1)
+        return "path = ? OR (path >= ? AND path < ?)", (root, prefix, end)
+
+    def load(self, root):
+        """{path: (mtime, bytes, blocks, subdirs)} for root and the directories below it"""
+        where, params = self._subtree(root)
+        rows = self.db.execute(f"SELECT path, mtime, bytes, blocks, subdirs FROM dirs WHERE {where}", params)
+        return {row[0]: row[1:] for row in rows}
+
+    def store(self, rows, stale=()):
+        """Save (path, mtime, bytes, blocks, subdirs) rows and forget stale paths"""
+        with self.db:
+            self.db.executemany("DELETE FROM dirs WHERE path = ?", ((path,) for path in stale))
+            self.db.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        self.db.close()
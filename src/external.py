@@ -0,0 +1,189 @@
+"""Starting external commands and streaming their output
+
+Commands inherit the terminal's stdio (output appears live and is never
+buffered by WinTerm) unless a pipeline connects them to pipes or files.
+
+Executables are resolved through a bash-style hash table and, where the
+platform has it, started with os.posix_spawn rather than fork+exec.
+"""
+import os
+import subprocess
+
+PIPE = subprocess.PIPE
+DEVNULL = subprocess.DEVNULL
+
+
+class CommandHash:
+    """Table of command name -> resolved executable, like bash's `hash`
+
+    The whole table is dropped when PATH changes or when the mtime of one
+    of its directories changes (a program was installed or removed there).
+    """
+    def __init__(self):
+        self.table = {}  # name -> [path, hits]
+        self.path = None
+        self.mtimes = None
+
+    def _validate(self):
+        path = os.environ.get('PATH', os.defpath)
+        mtimes = []
+        for directory in path.split(os.pathsep):
+            try:
+                mtimes.append(os.stat(directory or '.').st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        if path != self.path or mtimes != self.mtimes:
+            self.table.clear()
+            self.path = path
+            self.mtimes = mtimes
+
+    def lookup(self, name):
+        """Resolve a command name to an executable path (None if not found)"""
+        if os.sep in name or (os.altsep and os.altsep in name):
+            return name
+        self._validate()
+        entry = self.table.get(name)
+        if entry is None:
+            import shutil
+            resolved = shutil.which(name, path=self.path)
+            if resolved is None:
+                return None
+            entry = self.table[name] = [resolved, 0]
+        entry[1] += 1
+        return entry[0]
+
+    def forget(self, name=None):
+        """Drop one entry, or the whole table"""
+        if name is None:
+            self.table.clear()
+        else:
+            self.table.pop(name, None)
+
+
+command_hash = CommandHash()
+
+
+class SpawnedProcess:
+    """Minimal Popen-alike for a child started with os.posix_spawn"""
+    def __init__(self, pid, stdin=None, stdout=None, stderr=None):
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None:
+            pid, status = os.waitpid(self.pid, os.WNOHANG)
+            if pid:
+                self.returncode = os.waitstatus_to_exitcode(status)
+        return self.returncode
+
+    def wait(self):
+        if self.returncode is None:
+            _, status = os.waitpid(self.pid, 0)
+            self.returncode = os.waitstatus_to_exitcode(status)
+        return self.returncode
+
+    def kill(self):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, 9)
+            except ProcessLookupError:
+                pass
+
+
+def start(argv, cwd, stdin=None, stdout=None, stderr=None, background=False):
+    """Start an external command; None for a stream means inherit the terminal's
+
+    Streams may be PIPE, DEVNULL, a file descriptor or a file object.
+    A background command gets its own process group, so Ctrl-C at the
+    prompt doesn't reach it, and reads /dev/null instead of the terminal.
+    Raises FileNotFoundError if the command isn't on PATH.
+    """
+    executable = command_hash.lookup(argv[0])
+    if executable is None:
+        raise FileNotFoundError(f"{argv[0]}: command not found")
+    if background and stdin is None:
+        stdin = DEVNULL
+    if hasattr(os, 'posix_spawn') and os.path.abspath(cwd) == os.getcwd():
+        return _spawn(executable, argv, (stdin, stdout, stderr), background)
+    if not background:
+        group = {}
+    elif os.name == 'nt':
+        group = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        group = {'start_new_session': True}
+    return subprocess.Popen(argv, executable=executable, cwd=cwd,
+                            stdin=stdin, stdout=stdout, stderr=stderr, **group)
+
+
+def _spawn(executable, argv, streams, background=False):
+    """Start a child with os.posix_spawn, wiring up stdin/stdout/stderr"""
+    import signal
+
+    file_actions = []
+    child_fds = []    # our copies of the child's ends, closed after spawning
+    parent_ends = []  # (index, fd, mode) for PIPE streams
+    try:
+        for target, stream in enumerate(streams):
+            if stream is None:
+                continue
+            if stream == PIPE:
+                read_fd, write_fd = os.pipe()
+                if target == 0:
+                    fd, parent_fd, mode = read_fd, write_fd, 'wb'
+                else:
+                    fd, parent_fd, mode = write_fd, read_fd, 'rb'
+                child_fds.append(fd)
+                parent_ends.append((target, parent_fd, mode))
+            elif stream == DEVNULL:
+                fd = os.open(os.devnull, os.O_RDWR)
+                child_fds.append(fd)
+            elif isinstance(stream, int):
+                fd = stream
+            else:
+                fd = stream.fileno()
+            file_actions.append((os.POSIX_SPAWN_DUP2, fd, target))
+
+        group = {'setpgroup': 0} if background else {}
+        pid = os.posix_spawn(executable, argv, os.environ,
+                             file_actions=file_actions,
+                             setsigdef=(signal.SIGPIPE, signal.SIGXFSZ), **group)
+    except BaseException:
+        for _, fd, _ in parent_ends:
+            os.close(fd)
+        raise
+    finally:
+        for fd in child_fds:
+            os.close(fd)
+
+    files = [None, None, None]
+    for target, fd, mode in parent_ends:
+        files[target] = os.fdopen(fd, mode)
+    return SpawnedProcess(pid, *files)
+
+
+def hash_table(term, *args):
+    """Show or reset the command hash table"""
+    if not args:
+        if not command_hash.table:
+            return "hash: hash table empty"
+        lines = ["hits    command"]
+        for name, (path, hits) in sorted(command_hash.table.items()):
+            lines.append(f"{hits:4}    {path}")
+        return "\n".join(lines)
+
+    if args[0] == '-r':
+        command_hash.forget()
+        return ""
+    if args[0] == '-d':
+        for name in args[1:]:
+            command_hash.forget(name)
+        return ""
+
+    for name in args:
+        if command_hash.lookup(name) is None:
+            return term.error(f"hash: {name}: not found")
+        command_hash.table[name][1] = 0
+    return ""
@@ -0,0 +1,762 @@
+"""cp, rm and mv built-ins: parallel tree copy and removal
+
+cp walks each source tree with walker.Walker and hands the files to a pool
+of COPY_WORKERS threads in batches, so that small files don't each cost a
+trip through the pool and a network share sees many copies in flight at
+once. File data is copied inside the kernel with os.copy_file_range, or
+os.sendfile where that isn't supported, falling back to reads and writes.
+Modes and timestamps are copied once a file's data is complete, and to
+directories after everything below them.
+
+With --resume, files whose destination already has the source's size and
+mtime are skipped. A file cut short by an error or Ctrl-C never gets the
+source's mtime, so the next --resume run copies it again.
+
+rm -r walks the tree the same way and unlinks files on the pool. Every
+directory counts the file batches and subdirectories still inside it; the
+thread that finishes the last one removes the directory and moves up to
+its parent. Anything that can't be removed, or Ctrl-C, keeps its
+directories in place, so an interrupted rm leaves a smaller but intact tree.
+
+mv renames each source with os.rename. Only a source on another
+filesystem (EXDEV) is copied like cp -r, checked with SHA-256 if --verify
+is given, and then removed like rm -r; if anything failed to copy, the
+source is left untouched.
+
+On a terminal, a status line shows files (and bytes) done, the rate and,
+once the walk has found everything, the time left.
+"""
+import os
+import stat
+import time
+
+USAGE_CP = "Usage: cp [-r] [--resume] source... dest"
+USAGE_RM = "Usage: rm [-rfv] [--one-file-system] path..."
+USAGE_MV = "Usage: mv [--verify] source... dest"
+COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # mostly waiting on I/O
+BATCH_FILES = 64
+BATCH_BYTES = 8 * 1024 * 1024
+REMOVE_BATCH = 256
+COPY_STEP = 8 * 1024 * 1024   # bytes per copy call, between cancellation checks
+PROGRESS_INTERVAL = 0.5
+MTIME_SLACK_NS = 2 * 10 ** 9  # FAT and some SMB servers keep mtimes to 2 seconds
+
+
+def _cancel_check(term):
+    """term.cancelled for use from worker threads (the token is thread-local)"""
+    token = term.cancel_token
+    return token.is_set if token is not None else (lambda: False)
+
+
+def _duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class Progress:
+    """Thread-safe counters of the work done, shown as a status line
+
+    With count_bytes the rate and ETA are in bytes (cp), otherwise in files (rm).
+    """
+    def __init__(self, verb, count_bytes=True):
+        import threading
+        self.verb = verb
+        self.count_bytes = count_bytes
+        self.lock = threading.Lock()
+        self.files = 0
+        self.directories = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.total_files = 0
+        self.total_bytes = 0
+        self.scanning = True  # totals still growing
+        self.started = time.monotonic()
+        self.shown = self.started
+
+    def add(self, files=0, nbytes=0, skipped=0, directories=0):
+        with self.lock:
+            self.files += files
+            self.bytes += nbytes
+            self.skipped += skipped
+            self.directories += directories
+
+    def due(self):
+        """True at most once every PROGRESS_INTERVAL"""
+        now = time.monotonic()
+        if now - self.shown < PROGRESS_INTERVAL:
+            return False
+        self.shown = now
+        return True
+
+    def status(self):
+        from diskusage import human_size
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        done = self.files + self.skipped
+        text = f"{self.verb} {done}/{self.total_files}{'+' if self.scanning else ''} files"
+        if self.count_bytes:
+            rate = self.bytes / elapsed
+            text += f", {human_size(self.bytes)} at {human_size(rate)}/s"
+            left = self.total_bytes - self.bytes
+        else:
+            rate = done / elapsed
+            text += f" at {rate:.0f}/s"
+            left = self.total_files - done
+        if not self.scanning and rate > 0:
+            text += f", ETA {_duration(max(left, 0) / rate)}"
+        return text
+
+    def line(self):
+        """The status line, rewritten in place"""
+        return "\r\x1b[K" + self.status()
+
+    def summary(self):
+        from diskusage import human_size
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        if self.count_bytes:
+            text = (f"{self.verb} {self.files} files, {human_size(self.bytes)} in {elapsed:.1f}s "
+                    f"({human_size(self.bytes / elapsed)}/s)")
+        else:
+            text = (f"{self.verb} {self.files} files and {self.directories} directories "
+                    f"in {elapsed:.1f}s ({self.files / elapsed:.0f} files/s)")
+        if self.skipped:
+            text += f", {self.skipped} unchanged"
+        return text
+
+
+def _kernel_copy(source, target, size, progress, cancelled):
+    """Copy size bytes between file descriptors in the kernel; returns bytes copied
+
+    Stops early if cancelled or if neither copy_file_range nor sendfile
+    works for these files.
+    """
+    import errno
+    unsupported = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+                   errno.EBADF, errno.ENOTSOCK)
+    copied = 0
+    for method in ('copy_file_range', 'sendfile'):
+        call = getattr(os, method, None)
+        if call is None:
+            continue
+        try:
+            while copied < size and not cancelled():
+                if method == 'copy_file_range':
+                    done = call(source, target, min(COPY_STEP, size - copied), copied, copied)
+                else:
+                    os.lseek(target, copied, os.SEEK_SET)
+                    done = call(target, source, copied, min(COPY_STEP, size - copied))
+                if not done:
+                    break  # the source shrank
+                copied += done
+                progress.add(nbytes=done)
+            return copied
+        except OSError as e:
+            if copied or e.errno not in unsupported:
+                raise
+    return copied
+
+
+def copy_file(src, dst, st, progress, cancelled):
+    """Copy one regular file's data and then its mode and times; False if cancelled"""
+    with open(src, 'rb', buffering=0) as fsrc, open(dst, 'wb', buffering=0) as fdst:
+        size = st.st_size
+        copied = _kernel_copy(fsrc.fileno(), fdst.fileno(), size, progress, cancelled) if size else 0
+        if copied < size:
+            fsrc.seek(copied)
+            fdst.seek(copied)
+            while not cancelled():
+                data = fsrc.read(min(COPY_STEP, 1024 * 1024))
+                if not data:
+                    break
+                view = memoryview(data)
+                while view:
+                    view = view[fdst.write(view):]
+                progress.add(nbytes=len(data))
+        if cancelled():
+            return False
+    copy_metadata(dst, st)
+    return True
+
+
+def copy_metadata(dst, st, follow_symlinks=True):
+    if follow_symlinks:
+        os.chmod(dst, stat.S_IMODE(st.st_mode))
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns), follow_symlinks=follow_symlinks)
+
+
+def digest(path):
+    """SHA-256 of a file's contents"""
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.digest()
+
+
+def unchanged(dst, st):
+    """True if dst looks like a complete copy of a file with stat result st"""
+    try:
+        existing = os.stat(dst, follow_symlinks=False)
+    except OSError:
+        return False
+    return (stat.S_ISREG(existing.st_mode) and existing.st_size == st.st_size
+            and abs(existing.st_mtime_ns - st.st_mtime_ns) < MTIME_SLACK_NS)
+
+
+class BatchPool:
+    """A thread pool working through batches of files, collecting errors and output"""
+    def __init__(self, term, progress, name):
+        from concurrent.futures import ThreadPoolExecutor
+        import threading
+        self.name = name  # the command, for messages
+        self.cancelled = _cancel_check(term)
+        self.progress = progress
+        self.pool = ThreadPoolExecutor(COPY_WORKERS, thread_name_prefix=name)
+        self.pending = set()
+        self.errors = []
+        self.output = []  # lines to print, e.g. for -v
+        self.status_shown = False
+        self.lock = threading.Lock()
+
+    def error(self, message):
+        with self.lock:
+            self.errors.append(message)
+
+    def print(self, line):
+        with self.lock:
+            self.output.append(line)
+
+    def submit(self, func, *args):
+        """Run func on the pool; returns lines to show while waiting for a free slot"""
+        self.pending.add(self.pool.submit(func, *args))
+        return self.drain(COPY_WORKERS * 2)
+
+    def drain(self, limit=0):
+        """Wait until at most limit batches are queued; returns output and status lines"""
+        from concurrent.futures import wait, FIRST_COMPLETED
+        lines = []
+        while True:
+            if self.output:
+                with self.lock:
+                    lines.append("".join(self.output))
+                    self.output = []
+            if len(self.pending) <= limit:
+                return lines
+            done, self.pending = wait(self.pending, PROGRESS_INTERVAL, FIRST_COMPLETED)
+            for future in done:
+                future.result()
+            if self.progress.due():
+                lines.append(self.progress.line())
+
+    def visible(self, lines, show_status):
+        """The lines to print: status lines only if show_status, nothing once cancelled"""
+        for line in lines:
+            status = line.startswith("\r")
+            # After Ctrl-C only one more chunk is written: leave it to the report
+            if self.cancelled() or (status and not show_status):
+                continue
+            self.status_shown = self.status_shown or status
+            yield line
+
+    def close(self):
+        for future in self.pending:
+            future.cancel()
+        self.pool.shutdown(wait=True)
+
+
+class Copier(BatchPool):
+    """Copies batches of files on the pool"""
+    def __init__(self, term, progress, resume=False, verify=False, name='cp'):
+        super().__init__(term, progress, name)
+        self.resume = resume
+        self.verify = verify
+        self.batch = []
+        self.batch_bytes = 0
+
+    def add(self, src, dst, st):
+        """Queue one file, symlink or special file; returns progress lines to show"""
+        self.progress.total_files += 1
+        self.progress.total_bytes += st.st_size if stat.S_ISREG(st.st_mode) else 0
+        self.batch.append((src, dst, st))
+        self.batch_bytes += st.st_size
+        if len(self.batch) >= BATCH_FILES or self.batch_bytes >= BATCH_BYTES:
+            return self.flush()
+        return ()
+
+    def flush(self):
+        if not self.batch:
+            return self.drain(COPY_WORKERS * 2)
+        batch = self.batch
+        self.batch = []
+        self.batch_bytes = 0
+        return self.submit(self.copy_batch, batch)
+
+    def copy_batch(self, batch):
+        for src, dst, st in batch:
+            if self.cancelled():
+                return
+            try:
+                self.copy_one(src, dst, st)
+            except OSError as e:
+                self.error(f"{self.name}: cannot copy '{src}' to '{dst}': {e.strerror}")
+
+    def copy_one(self, src, dst, st):
+        mode = st.st_mode
+        if stat.S_ISREG(mode):
+            if self.resume and unchanged(dst, st):
+                self.progress.add(skipped=1)
+                return
+            if not copy_file(src, dst, st, self.progress, self.cancelled):
+                return
+            if self.verify and digest(src) != digest(dst):
+                self.error(f"{self.name}: '{dst}' differs from '{src}' after copying")
+                return
+            self.progress.add(files=1)
+        elif stat.S_ISLNK(mode):
+            # Like cp -r: links are copied as links
+            target = os.readlink(src)
+            if os.path.lexists(dst):
+                if self.resume and os.path.islink(dst) and os.readlink(dst) == target:
+                    self.progress.add(skipped=1)
+                    return
+                os.unlink(dst)
+            os.symlink(target, dst)
+            if os.utime in os.supports_follow_symlinks:
+                copy_metadata(dst, st, follow_symlinks=False)
+            self.progress.add(files=1)
+        else:
+            self.error(f"{self.name}: not copying special file '{src}'")
+
+
+def parse_cp_args(args):
+    """Return (options, paths); raises ValueError on bad arguments"""
+    options = {'resume': False}
+    paths = []
+    for arg in args:
+        if arg == '--resume':
+            options['resume'] = True
+        elif arg.startswith('--'):
+            raise ValueError(f"unrecognized option '{arg}'")
+        elif arg.startswith('-') and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag not in 'rRa':
+                    raise ValueError(f"invalid option -- '{flag}'")
+        else:
+            paths.append(arg)
+    return options, paths
+
+
+def cp(term, *args):
+    """Copy files and directory trees"""
+    try:
+        options, paths = parse_cp_args(args)
+    except ValueError as e:
+        return term.error(f"cp: {e}\n{USAGE_CP}")
+    if len(paths) < 2:
+        return term.error(f"cp: missing operand\n{USAGE_CP}")
+    *sources, dest = paths
+    dest_path = os.path.join(term.current_dir, dest)
+    into = os.path.isdir(dest_path)
+    if len(sources) > 1 and not into:
+        return term.error(f"cp: target '{dest}' is not a directory")
+    return _cp(term, sources, dest_path, into, options['resume'])
+
+
+def _cp(term, sources, dest_path, into, resume):
+    progress = Progress("copied")
+    copier = Copier(term, progress, resume)
+    show = term.tty_output
+    try:
+        for name in sources:
+            src = os.path.normpath(os.path.join(term.current_dir, name))
+            dst = os.path.join(dest_path, os.path.basename(src)) if into else dest_path
+            try:
+                st = os.stat(src)
+            except OSError as e:
+                copier.error(f"cp: cannot stat '{name}': {e.strerror}")
+                continue
+            if os.path.exists(dst) and os.path.samefile(src, dst):
+                copier.error(f"cp: '{name}' and '{dst}' are the same file")
+                continue
+            if not stat.S_ISDIR(st.st_mode):
+                lines = copier.add(src, dst, st)
+            else:
+                if (os.path.normpath(dst) + os.sep).startswith(src + os.sep):
+                    copier.error(f"cp: cannot copy a directory, '{name}', into itself")
+                    continue
+                lines = _copy_tree(term, copier, src, dst, st)
+            yield from copier.visible(lines, show)
+            if term.cancelled():
+                break
+        progress.scanning = term.cancelled()  # no ETA in the interrupted report
+        yield from copier.visible(copier.flush() + copier.drain(), show)
+    finally:
+        copier.close()
+
+    report = _report(term, "cp", copier)
+    if report:
+        yield report
+
+
+def _report(term, command, pool):
+    """Final text of a cp/rm run: clears the status line, then summary and errors"""
+    report = "\r\x1b[K" if pool.status_shown else ""
+    if term.cancelled():
+        pool.error(f"{command}: {term.cancel_token.reason}; {pool.progress.status()}")
+    elif pool.status_shown:
+        report += pool.progress.summary() + "\n"
+    report += "".join(term.error_line(message) for message in pool.errors)
+    if term.cancelled():
+        term.last_status = 130
+    return report
+
+
+def _copy_tree(term, copier, src, dst, st):
+    """Create the directories of a tree as they are walked and queue its files"""
+    from walker import Walker
+
+    cut = len(src)
+    directories = {dst: st}  # destination -> source stat, stamped at the end
+    for directory in Walker(src, stat=True, cancelled=term.cancelled):
+        target = dst + directory.path[cut:]
+        if directory.error is not None:
+            copier.error(f"{copier.name}: cannot open directory '{directory.path}': {directory.error.strerror}")
+            continue
+        try:
+            # Subdirectories can be yielded before their parent
+            os.makedirs(target, exist_ok=True)
+        except OSError as e:
+            copier.error(f"{copier.name}: cannot create directory '{target}': {e.strerror}")
+            continue
+        for entry in directory.entries:
+            try:
+                entry_st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue  # removed while walking
+            path = os.path.join(target, entry.name)
+            if stat.S_ISDIR(entry_st.st_mode):
+                directories[path] = entry_st
+            else:
+                yield from copier.add(entry.path, path, entry_st)
+    if term.cancelled():
+        return
+    yield from copier.flush()
+    yield from copier.drain()
+    # Deepest first, so setting a directory's mtime isn't undone by its children
+    for path in sorted(directories, key=lambda p: p.count(os.sep), reverse=True):
+        try:
+            copy_metadata(path, directories[path])
+        except FileNotFoundError:
+            pass  # its source couldn't be read
+        except OSError as e:
+            copier.error(f"{copier.name}: cannot preserve times for '{path}': {e.strerror}")
+
+
+class Remover(BatchPool):
+    """Removes trees: files are unlinked on the pool in batches, and each
+    directory is removed by whichever thread finishes the last thing in it
+    """
+    def __init__(self, term, progress, verbose=False, name='rm'):
+        super().__init__(term, progress, name)
+        self.verbose = verbose
+        self.remaining = {}   # directory -> batches and subdirectories not yet removed
+        self.registered = set()
+        self.kept = set()     # directories that can't be removed (something in them wasn't)
+        self.root = None
+        self.show = lambda path: path
+
+    def release(self, path, failed=False):
+        """One thing in a directory is done; remove the directory if it was the last"""
+        while path is not None:
+            with self.lock:
+                if failed:
+                    self.kept.add(path)
+                # Subdirectories can be walked and removed before their parent is read
+                count = self.remaining[path] = self.remaining.get(path, 0) - 1
+                if count or path not in self.registered:
+                    return
+                del self.remaining[path]
+                self.registered.discard(path)
+                failed = path in self.kept
+            parent = None if path == self.root else os.path.dirname(path)
+            if not failed:
+                try:
+                    os.rmdir(path)
+                    self.progress.add(directories=1)
+                    if self.verbose:
+                        self.print(f"removed directory '{self.show(path)}'\n")
+                except OSError as e:
+                    self.error(f"{self.name}: cannot remove '{self.show(path)}': {e.strerror}")
+                    failed = True
+            path = parent
+
+    def unlink_batch(self, directory, paths):
+        failed = False
+        for path in paths:
+            if self.cancelled():
+                failed = True  # leave the directory in place
+                break
+            try:
+                unlink(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                self.error(f"{self.name}: cannot remove '{self.show(path)}': {e.strerror}")
+                failed = True
+                continue
+            self.progress.add(files=1)
+            if self.verbose:
+                self.print(f"removed '{self.show(path)}'\n")
+        self.release(directory, failed)
+
+    def remove_tree(self, term, root, shown, one_filesystem):
+        """Walk the tree under root, queueing its files; returns status lines"""
+        from walker import Walker
+
+        self.root = root
+        cut = len(root)
+        self.show = lambda path: shown + path[cut:]
+        device = os.lstat(root).st_dev if one_filesystem else None
+        for directory in Walker(root, one_filesystem=one_filesystem, cancelled=term.cancelled):
+            path = directory.path
+            if directory.error is not None:
+                self.error(f"{self.name}: cannot remove '{self.show(path)}': {directory.error.strerror}")
+                self.register(path, 0)
+                self.release(path, failed=True)
+                continue
+            files = []
+            subdirs = 0
+            skipped = False
+            for entry in directory.entries:
+                # The same test the walker uses to decide what to descend into
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if is_dir and device is not None and entry.stat().st_dev != device:
+                        self.error(f"{self.name}: skipping '{self.show(entry.path)}', since it's on a different device")
+                        skipped = True
+                        continue
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    subdirs += 1
+                else:
+                    files.append(entry.path)
+            self.progress.total_files += len(files)
+            batches = [files[i:i + REMOVE_BATCH] for i in range(0, len(files), REMOVE_BATCH)]
+            self.register(path, subdirs + len(batches))
+            for batch in batches:
+                yield from self.submit(self.unlink_batch, path, batch)
+            self.release(path, failed=skipped)
+        yield from self.drain()
+        if term.cancelled():
+            return
+        with self.lock:
+            # Directories the walk never reached (e.g. cancelled) are left as they are
+            self.remaining.clear()
+            self.registered.clear()
+            self.kept.clear()
+
+    def register(self, path, count):
+        """A directory has been read: count batches and subdirectories to wait for"""
+        with self.lock:
+            self.remaining[path] = self.remaining.get(path, 0) + count + 1  # +1 until queued
+            self.registered.add(path)
+
+
+def unlink(path):
+    try:
+        os.unlink(path)
+    except PermissionError:
+        if os.name != 'nt':
+            raise
+        # Windows won't delete read-only files
+        os.chmod(path, stat.S_IWRITE)
+        os.unlink(path)
+
+
+def parse_rm_args(args):
+    """Return (options, paths); raises ValueError on bad arguments"""
+    options = {'recursive': False, 'force': False, 'verbose': False, 'one_filesystem': False}
+    flags = {'r': 'recursive', 'R': 'recursive', 'f': 'force', 'v': 'verbose'}
+    paths = []
+    for arg in args:
+        if arg == '--one-file-system':
+            options['one_filesystem'] = True
+        elif arg in ('--recursive', '--force', '--verbose'):
+            options[arg[2:]] = True
+        elif arg.startswith('--'):
+            raise ValueError(f"unrecognized option '{arg}'")
+        elif arg.startswith('-') and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag not in flags:
+                    raise ValueError(f"invalid option -- '{flag}'")
+                options[flags[flag]] = True
+        else:
+            paths.append(arg)
+    return options, paths
+
+
+def rm(term, *args):
+    """Remove files and directory trees"""
+    try:
+        options, paths = parse_rm_args(args)
+    except ValueError as e:
+        return term.error(f"rm: {e}\n{USAGE_RM}")
+    if not paths:
+        if options['force']:
+            return None
+        return term.error(f"rm: missing operand\n{USAGE_RM}")
+    return _rm(term, paths, options)
+
+
+def _rm(term, paths, options):
+    progress = Progress("removed", count_bytes=False)
+    remover = Remover(term, progress, options['verbose'])
+    show = term.tty_output and not options['verbose']
+    try:
+        for name in paths:
+            path = os.path.normpath(os.path.join(term.current_dir, name))
+            if os.path.basename(name.rstrip('/' + os.sep)) in ('.', '..'):
+                remover.error(f"rm: refusing to remove '.' or '..' directory: skipping '{name}'")
+                continue
+            try:
+                st = os.lstat(path)
+            except OSError as e:
+                if not (options['force'] and isinstance(e, FileNotFoundError)):
+                    remover.error(f"rm: cannot remove '{name}': {e.strerror}")
+                continue
+            if not stat.S_ISDIR(st.st_mode):
+                try:
+                    unlink(path)
+                except OSError as e:
+                    remover.error(f"rm: cannot remove '{name}': {e.strerror}")
+                    continue
+                progress.add(files=1)
+                if options['verbose']:
+                    remover.print(f"removed '{name}'\n")
+                continue
+            if not options['recursive']:
+                remover.error(f"rm: cannot remove '{name}': Is a directory")
+                continue
+            if path == os.path.dirname(path):
+                remover.error(f"rm: it is dangerous to operate recursively on '{name}'")
+                continue
+            lines = remover.remove_tree(term, path, name.rstrip('/' + os.sep) or name,
+                                        options['one_filesystem'])
+            yield from remover.visible(lines, show)
+            if term.cancelled():
+                break
+        progress.scanning = term.cancelled()  # no ETA in the interrupted report
+        yield from remover.visible(remover.drain(), show)
+    finally:
+        remover.close()
+
+    report = _report(term, "rm", remover)
+    if report:
+        yield report
+
+
+def parse_mv_args(args):
+    """Return (options, paths); raises ValueError on bad arguments"""
+    options = {'verify': False}
+    paths = []
+    for arg in args:
+        if arg == '--verify':
+            options['verify'] = True
+        elif arg.startswith('--'):
+            raise ValueError(f"unrecognized option '{arg}'")
+        elif arg.startswith('-') and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag != 'f':
+                    raise ValueError(f"invalid option -- '{flag}'")
+        else:
+            paths.append(arg)
+    return options, paths
+
+
+def mv(term, *args):
+    """Move or rename files and directories"""
+    try:
+        options, paths = parse_mv_args(args)
+    except ValueError as e:
+        return term.error(f"mv: {e}\n{USAGE_MV}")
+    if len(paths) < 2:
+        return term.error(f"mv: missing operand\n{USAGE_MV}")
+    *sources, dest = paths
+    dest_path = os.path.join(term.current_dir, dest)
+    into = os.path.isdir(dest_path)
+    if len(sources) > 1 and not into:
+        return term.error(f"mv: target '{dest}' is not a directory")
+    return _mv(term, sources, dest_path, into, options['verify'])
+
+
+def _mv(term, sources, dest_path, into, verify):
+    import errno
+
+    progress = Progress("moved")
+    copier = Copier(term, progress, verify=verify, name='mv')
+    show = term.tty_output
+    try:
+        for name in sources:
+            src = os.path.normpath(os.path.join(term.current_dir, name))
+            dst = os.path.join(dest_path, os.path.basename(src)) if into else dest_path
+            try:
+                if os.path.lexists(dst) and os.path.samefile(src, dst):
+                    copier.error(f"mv: '{name}' and '{dst}' are the same file")
+                    continue
+                os.rename(src, dst)
+                continue
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    if e.errno == errno.EINVAL and (dst + os.sep).startswith(src + os.sep):
+                        copier.error(f"mv: cannot move '{name}' to a subdirectory of itself")
+                    elif isinstance(e, FileNotFoundError) and not os.path.lexists(src):
+                        copier.error(f"mv: cannot stat '{name}': No such file or directory")
+                    else:
+                        copier.error(f"mv: cannot move '{name}' to '{dst}': {e.strerror}")
+                    continue
+            # Another filesystem: copy, then remove the source if everything arrived
+            yield from copier.visible(_move_across(term, copier, src, dst), show)
+            if term.cancelled():
+                break
+        progress.scanning = term.cancelled()
+    finally:
+        copier.close()
+
+    report = _report(term, "mv", copier)
+    if report:
+        yield report
+
+
+def _move_across(term, copier, src, dst):
+    """Copy src to dst on another filesystem, then remove src; yields status lines"""
+    errors = len(copier.errors)
+    try:
+        st = os.lstat(src)
+    except OSError as e:
+        copier.error(f"mv: cannot stat '{src}': {e.strerror}")
+        return
+    if stat.S_ISDIR(st.st_mode):
+        yield from _copy_tree(term, copier, src, dst, st)
+    else:
+        if os.path.isdir(dst):
+            copier.error(f"mv: cannot overwrite directory '{dst}' with non-directory")
+            return
+        yield from copier.add(src, dst, st)
+        yield from copier.flush()
+    yield from copier.drain()
+    if term.cancelled() or len(copier.errors) > errors:
+        return  # keep the source; what was copied stays for a second try
+
+    if not stat.S_ISDIR(st.st_mode):
+        try:
+            unlink(src)
+        except OSError as e:
+            copier.error(f"mv: cannot remove '{src}': {e.strerror}")
+        return
+    remover = Remover(term, Progress("removed", count_bytes=False), name='mv')
+    try:
+        yield from remover.remove_tree(term, src, src, one_filesystem=False)
+    finally:
+        remover.close()
+        copier.errors.extend(remover.errors)
@@ -0,0 +1,401 @@
+"""find built-in: the expression is compiled into a single matcher
+
+The command line expression (tests, actions and the ! -a -o ( ) operators)
+is parsed once into nested closures. Within a chain of tests, those that
+need stat() are moved after the cheap ones (name, path, type from d_type)
+so they only run when the cheap ones can't decide. The matcher runs on
+walker.Walker's threads, -prune stops the walk descending into a directory
+and results stream one directory at a time.
+"""
+import os
+import re
+import stat
+import time
+import fnmatch
+
+USAGE = "Usage: find [path...] [expression]"
+
+# How expensive a test is, for ordering chains of tests
+CHEAP, TYPE, STAT = 0, 1, 2
+
+
+class Visit:
+    """A file being matched: its entry, depth, display path and the actions' effects"""
+    __slots__ = ('entry', 'depth', 'path', 'output', 'prune', 'quit')
+
+    def __init__(self, entry, depth, path):
+        self.entry = entry
+        self.depth = depth
+        self.path = path
+        self.output = []
+        self.prune = False
+        self.quit = False
+
+
+class Node:
+    """Compiled part of an expression; func(visit) returns True or False
+
+    pure nodes have no side effects, so they can be reordered.
+    """
+    __slots__ = ('func', 'cost', 'pure')
+
+    def __init__(self, func, cost=CHEAP, pure=True):
+        self.func = func
+        self.cost = cost
+        self.pure = pure
+
+
+class RootEntry:
+    """os.DirEntry-alike for a starting point given on the command line"""
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.st = os.lstat(path)
+
+    def stat(self, follow_symlinks=True):
+        return self.st
+
+    def is_dir(self, follow_symlinks=True):
+        return stat.S_ISDIR(self.st.st_mode)
+
+    def is_file(self, follow_symlinks=True):
+        return stat.S_ISREG(self.st.st_mode)
+
+    def is_symlink(self):
+        return stat.S_ISLNK(self.st.st_mode)
+
+
+TRUE = Node(lambda v: True)
+
+
+def _stat(visit):
+    try:
+        return visit.entry.stat(follow_symlinks=False)
+    except OSError:
+        return None
+
+
+def _reorder(nodes):
+    """Sort each run of side-effect-free nodes cheapest first"""
+    ordered = []
+    run = []
+    for node in nodes:
+        if node.pure:
+            run.append(node)
+        else:
+            ordered.extend(sorted(run, key=lambda n: n.cost))
+            ordered.append(node)
+            run = []
+    ordered.extend(sorted(run, key=lambda n: n.cost))
+    return ordered
+
+
+def _and(nodes):
+    if len(nodes) == 1:
+        return nodes[0]
+    nodes = _reorder(nodes)
+    funcs = [node.func for node in nodes]
+
+    def match_all(v):
+        for func in funcs:
+            if not func(v):
+                return False
+        return True
+    return Node(match_all, max(n.cost for n in nodes), all(n.pure for n in nodes))
+
+
+def _or(nodes):
+    if len(nodes) == 1:
+        return nodes[0]
+    nodes = _reorder(nodes)
+    funcs = [node.func for node in nodes]
+
+    def match_any(v):
+        for func in funcs:
+            if func(v):
+                return True
+        return False
+    return Node(match_any, max(n.cost for n in nodes), all(n.pure for n in nodes))
+
+
+def _not(node):
+    func = node.func
+    return Node(lambda v: not func(v), node.cost, node.pure)
+
+
+def _compare(text, option):
+    """Turn '+N', '-N' or 'N' into a test of an integer against N"""
+    sign = text[:1] if text[:1] in '+-' else ''
+    number = text[len(sign):]
+    if not number.isdigit():
+        raise ValueError(f"invalid argument '{text}' to '{option}'")
+    n = int(number)
+    if sign == '+':
+        return lambda value: value > n
+    if sign == '-':
+        return lambda value: value < n
+    return lambda value: value == n
+
+
+SIZE_UNITS = {'c': 1, 'w': 2, 'b': 512, 'k': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+class Parser:
+    """Recursive descent parser for find expressions
+
+    expr    := and ('-o' and)*
+    and     := unary (['-a'] unary)*
+    unary   := ('!' | '-not') unary | '(' expr ')' | primary
+    """
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+        self.now = time.time()
+        self.max_depth = None
+        self.min_depth = 0
+        self.has_action = False
+
+    def parse(self):
+        node = self.expr() if self.tokens else TRUE
+        if self.i < len(self.tokens):
+            raise ValueError(f"unexpected '{self.tokens[self.i]}'")
+        if not self.has_action:
+            node = _and([node, self.action_print("\n")])
+        return node
+
+    def peek(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        self.i += 1
+        return token
+
+    def argument(self, option):
+        if self.peek() is None:
+            raise ValueError(f"missing argument to '{option}'")
+        return self.next()
+
+    def expr(self):
+        nodes = [self.and_expr()]
+        while self.peek() in ('-o', '-or'):
+            self.next()
+            nodes.append(self.and_expr())
+        return _or(nodes)
+
+    def and_expr(self):
+        nodes = [self.unary()]
+        while self.peek() not in (None, '-o', '-or', ')'):
+            if self.peek() in ('-a', '-and'):
+                self.next()
+            nodes.append(self.unary())
+        return _and(nodes)
+
+    def unary(self):
+        token = self.next()
+        if token is None:
+            raise ValueError("expected an expression")
+        if token in ('!', '-not'):
+            return _not(self.unary())
+        if token == '(':
+            node = self.expr()
+            if self.next() != ')':
+                raise ValueError("missing ')'")
+            return node
+        method = getattr(self, 'primary_' + token.lstrip('-').replace('-', '_'), None)
+        if not token.startswith('-') or method is None:
+            raise ValueError(f"unknown predicate '{token}'")
+        return method(token)
+
+    # Tests
+
+    def primary_name(self, option, flags=0):
+        pattern = self.argument(option)
+        if not flags and not any(c in pattern for c in '*?['):
+            return Node(lambda v: v.entry.name == pattern)
+        match = re.compile(fnmatch.translate(pattern), flags).match
+        return Node(lambda v: match(v.entry.name) is not None)
+
+    def primary_iname(self, option):
+        return self.primary_name(option, re.IGNORECASE)
+
+    def primary_path(self, option, flags=0):
+        match = re.compile(fnmatch.translate(self.argument(option)), flags).match
+        return Node(lambda v: match(v.path) is not None)
+
+    def primary_ipath(self, option):
+        return self.primary_path(option, re.IGNORECASE)
+
+    def primary_type(self, option):
+        kind = self.argument(option)
+        if kind == 'f':
+            return Node(lambda v: v.entry.is_file(follow_symlinks=False), TYPE)
+        if kind == 'd':
+            return Node(lambda v: v.entry.is_dir(follow_symlinks=False), TYPE)
+        if kind == 'l':
+            return Node(lambda v: v.entry.is_symlink(), TYPE)
+        raise ValueError(f"unknown argument to -type: {kind}")
+
+    def primary_size(self, option):
+        text = self.argument(option)
+        unit = SIZE_UNITS['b']
+        if text[-1:] in SIZE_UNITS:
+            unit = SIZE_UNITS[text[-1]]
+            text = text[:-1]
+        compare = _compare(text, option)
+
+        def size(v):
+            st = _stat(v)
+            return st is not None and compare(-(-st.st_size // unit))
+        return Node(size, STAT)
+
+    def _age(self, option, seconds):
+        compare = _compare(self.argument(option), option)
+        now = self.now
+
+        def age(v):
+            st = _stat(v)
+            return st is not None and compare(int((now - st.st_mtime) // seconds))
+        return Node(age, STAT)
+
+    def primary_mtime(self, option):
+        return self._age(option, 86400)
+
+    def primary_mmin(self, option):
+        return self._age(option, 60)
+
+    def primary_empty(self, option):
+        def empty(v):
+            st = _stat(v)
+            if st is None:
+                return False
+            if stat.S_ISDIR(st.st_mode):
+                try:
+                    with os.scandir(v.entry.path) as it:
+                        return next(it, None) is None
+                except OSError:
+                    return False
+            return stat.S_ISREG(st.st_mode) and st.st_size == 0
+        return Node(empty, STAT)
+
+    def primary_true(self, option):
+        return TRUE
+
+    def primary_false(self, option):
+        return Node(lambda v: False)
+
+    # Options (apply to the whole walk, always true)
+
+    def primary_maxdepth(self, option):
+        self.max_depth = self._depth(option)
+        return TRUE
+
+    def primary_mindepth(self, option):
+        self.min_depth = self._depth(option)
+        return TRUE
+
+    def _depth(self, option):
+        value = self.argument(option)
+        if not value.isdigit():
+            raise ValueError(f"invalid argument '{value}' to '{option}'")
+        return int(value)
+
+    # Actions
+
+    def action_print(self, end):
+        self.has_action = True
+
+        def emit(v):
+            v.output.append(v.path + end)
+            return True
+        return Node(emit, pure=False)
+
+    def primary_print(self, option):
+        return self.action_print("\n")
+
+    def primary_print0(self, option):
+        return self.action_print("\0")
+
+    def primary_prune(self, option):
+        def prune(v):
+            v.prune = True
+            return True
+        return Node(prune, pure=False)
+
+    def primary_quit(self, option):
+        def quit(v):
+            v.quit = True
+            return True
+        return Node(quit, pure=False)
+
+
+def split_args(args):
+    """Separate the starting points from the expression"""
+    paths = []
+    for i, arg in enumerate(args):
+        if (arg.startswith('-') and len(arg) > 1) or arg in ('(', '!', ')'):
+            return paths, list(args[i:])
+        paths.append(arg)
+    return paths, []
+
+
+def find(term, *args):
+    """Search for files"""
+    paths, expression = split_args(args)
+    parser = Parser(expression)
+    try:
+        matcher = parser.parse()
+    except ValueError as e:
+        return term.error(f"find: {e}\n{USAGE}")
+    return _find(term, paths or ['.'], matcher.func, parser)
+
+
+def _find(term, paths, match, parser):
+    from walker import Walker
+
+    for path in paths:
+        full = os.path.normpath(os.path.join(term.current_dir, path))
+        # Paths are shown starting with the argument as typed
+        prefix = path if full.endswith(os.sep) else path.rstrip('/' + os.sep) or path
+        cut = len(full)
+
+        try:
+            root = Visit(RootEntry(full, os.path.basename(prefix) or prefix), 0, path)
+        except OSError as e:
+            yield term.error_line(f"find: '{path}': {e.strerror}")
+            continue
+        if parser.min_depth == 0:
+            match(root)
+        if root.output:
+            yield "".join(root.output)
+        if root.quit:
+            return
+        if root.prune or not root.entry.is_dir():
+            continue
+
+        def visit(entry, depth):
+            v = Visit(entry, depth, prefix + entry.path[cut:])
+            if depth >= parser.min_depth:
+                match(v)
+            if v.output or v.quit:
+                return ("".join(v.output), v.quit), not (v.prune or v.quit)
+            return None, not v.prune
+
+        walker = Walker(full, max_depth=parser.max_depth, visit=visit, cancelled=term.cancelled)
+        for directory in walker:
+            if directory.error is not None:
+                shown = prefix + directory.path[cut:]
+                yield term.error_line(f"find: '{shown}': {directory.error.strerror}")
+                continue
+            chunk = []
+            for text, quit in directory.results:
+                chunk.append(text)
+                if quit:
+                    yield "".join(chunk)
+                    return
+            if chunk:
+                yield "".join(chunk)
+        if term.cancelled():
+            # Keep the matches found so far
+            yield term.error_line(f"find: {term.cancel_token.reason}", 130)
+            return
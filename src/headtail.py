@@ -0,0 +1,468 @@
+"""head and tail built-ins
+
+head stops reading once it has N lines. tail -n N on a regular file seeks
+back from the end in TAIL_BLOCK reads until it has seen N line breaks,
+then copies the rest as a pipeline.FileRegion, so the size of the file
+doesn't matter. Pipeline input is read in full, keeping only the last N
+lines.
+
+tail -f follows files by name: data appended to the open file is printed
+as it arrives, a truncated file is read again from the start and a file
+replaced by another inode (log rotation) is reopened. On Linux the
+followed files' directories are watched with inotify (through ctypes);
+elsewhere, or if inotify is unavailable, files are polled at an interval
+that backs off while nothing changes.
+"""
+import os
+import sys
+import stat
+import time
+
+USAGE_HEAD = "Usage: head [-n N] [-q] [-v] [file...]"
+USAGE_TAIL = "Usage: tail [-n [+]N] [-f] [-q] [-v] [file...]"
+DEFAULT_LINES = 10
+TAIL_BLOCK = 64 * 1024
+FOLLOW_READ = 1024 * 1024    # most bytes read from one file before checking the others
+WAKE_INTERVAL = 0.25         # how often a waiting tail -f checks for Ctrl-C
+RESCAN_INTERVAL = 5.0        # with inotify, check every file this often anyway
+POLL_MIN, POLL_MAX = 0.05, 1.0
+
+
+class Options:
+    """Parsed head/tail command line"""
+    def __init__(self):
+        self.lines = DEFAULT_LINES
+        self.from_start = False  # tail -n +N: start at line N
+        self.follow = False
+        self.headers = None      # None: only with several files
+
+
+def parse_args(args, follow=False):
+    """Return (Options, files); raises ValueError on bad arguments"""
+    options = Options()
+    files = []
+    args = list(args)
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg == '-' or not arg.startswith('-'):
+            files.append(arg)
+            continue
+        if arg[1:].isdigit():
+            arg = '-n' + arg[1:]  # head -5
+        if arg in ('-n', '--lines'):
+            if i >= len(args):
+                raise ValueError(f"option '{arg}' requires an argument")
+            value = args[i]
+            i += 1
+        elif arg.startswith('-n'):
+            value = arg[2:]
+        elif arg.startswith('--lines='):
+            value = arg[len('--lines='):]
+        else:
+            for flag in arg[1:]:
+                if flag in 'fF' and follow:
+                    options.follow = True
+                elif flag == 'q':
+                    options.headers = False
+                elif flag == 'v':
+                    options.headers = True
+                else:
+                    raise ValueError(f"invalid option -- '{flag}'")
+            continue
+        if follow and value.startswith('+'):
+            options.from_start = True
+            value = value[1:]
+        if not value.isdigit():
+            raise ValueError(f"invalid number of lines: '{value}'")
+        options.lines = int(value)
+    return options, files
+
+
+def _header(name, first):
+    return ("" if first else "\n") + f"==> {name} <==\n"
+
+
+def _open(term, command, name):
+    """Open a named file for reading, or return an error line"""
+    path = os.path.join(term.current_dir, name)
+    try:
+        f = open(path, 'rb')
+    except OSError as e:
+        return None, term.error_line(f"{command}: cannot open '{name}' for reading: {e.strerror}")
+    if stat.S_ISDIR(os.fstat(f.fileno()).st_mode):
+        f.close()
+        return None, term.error_line(f"{command}: error reading '{name}': Is a directory")
+    return f, None
+
+
+def head(term, *args, stdin=None):
+    """Output the first lines of files"""
+    try:
+        options, files = parse_args(args)
+    except ValueError as e:
+        return term.error(f"head: {e}\n{USAGE_HEAD}")
+    if not files:
+        if stdin is None:
+            return term.error(USAGE_HEAD)
+        return _head_stream(stdin, options.lines)
+    return _head_files(term, options, files)
+
+
+def _head_stream(stdin, count):
+    from pipeline import iter_byte_lines
+    import itertools
+    lines = list(itertools.islice(iter_byte_lines(stdin), count))
+    if lines:
+        yield b"".join(lines)
+
+
+def _head_files(term, options, files):
+    show_headers = options.headers if options.headers is not None else len(files) > 1
+    for index, name in enumerate(files):
+        f, error = _open(term, "head", name)
+        if f is None:
+            yield error
+            continue
+        with f:
+            if show_headers:
+                yield _header(name, index == 0)
+            yield from _head_file(f, options.lines)
+
+
+def _head_file(f, count):
+    """Yield the first count lines of a binary file, reading no further than needed"""
+    from pipeline import CHUNK_SIZE
+    while count > 0:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        found = chunk.count(b"\n")
+        if found < count:
+            count -= found
+            yield chunk
+            continue
+        end = -1
+        for _ in range(count):
+            end = chunk.index(b"\n", end + 1)
+        yield chunk[:end + 1]
+        return
+
+
+def tail(term, *args, stdin=None):
+    """Output the last lines of files, optionally following them as they grow"""
+    try:
+        options, files = parse_args(args, follow=True)
+    except ValueError as e:
+        return term.error(f"tail: {e}\n{USAGE_TAIL}")
+    if not files:
+        if stdin is None:
+            return term.error(USAGE_TAIL)
+        return _tail_stream(stdin, options)
+    return _tail_files(term, options, files)
+
+
+def _tail_stream(stdin, options):
+    from pipeline import iter_byte_lines
+    import collections
+    import itertools
+    lines = iter_byte_lines(stdin)
+    if options.from_start:
+        for line in itertools.islice(lines, max(options.lines - 1, 0), None):
+            yield line
+        return
+    if not options.lines:
+        collections.deque(lines, maxlen=0)  # read to the end, like tail
+        return
+    last = collections.deque(lines, maxlen=options.lines)
+    if last:
+        yield b"".join(last)
+
+
+def tail_offset(f, size, count):
+    """Offset in a binary file where its last count lines start"""
+    if count == 0:
+        return size
+    f.seek(size - 1)
+    # A trailing line break ends the last line rather than starting another
+    position = size - 1 if size and f.read(1) == b"\n" else size
+    while position > 0:
+        start = max(0, position - TAIL_BLOCK)
+        f.seek(start)
+        block = f.read(position - start)
+        end = len(block)
+        while True:
+            end = block.rfind(b"\n", 0, end)
+            if end < 0:
+                break
+            count -= 1
+            if count == 0:
+                return start + end + 1
+        position = start
+    return 0
+
+
+def _tail_file(f, options):
+    """Yield the chunks tail prints for an open file; returns the offset it stopped at"""
+    from pipeline import FileRegion
+    st = os.fstat(f.fileno())
+    if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+        size = st.st_size
+        if options.from_start:
+            f.seek(0)
+            skip = max(options.lines - 1, 0)
+            offset = 0
+            while skip and offset < size:
+                line = f.readline()
+                offset += len(line)
+                skip -= 1
+        else:
+            offset = tail_offset(f, size, options.lines)
+        if offset < size:
+            yield FileRegion(f, offset, size - offset)
+        return size
+    # Pipes and devices can't seek, and files that stat as empty (/proc)
+    # may still have data: read them through
+    yield from _tail_stream(iter(lambda: f.read(TAIL_BLOCK), b""), options)
+    return f.tell() if f.seekable() else 0
+
+
+def _tail_files(term, options, files):
+    show_headers = options.headers if options.headers is not None else len(files) > 1
+    followers = []
+    shown = None  # follower whose header was printed last
+    for index, name in enumerate(files):
+        f, error = _open(term, "tail", name)
+        if f is None:
+            yield error
+            if options.follow:
+                # Keep trying: it may be created later
+                follower = Follower(name, os.path.join(term.current_dir, name))
+                follower.missing = True
+                followers.append(follower)
+            continue
+        if show_headers:
+            yield _header(name, index == 0)
+        if not options.follow:
+            with f:
+                yield from _tail_file(f, options)
+            continue
+        follower = Follower(name, os.path.join(term.current_dir, name))
+        followers.append(follower)
+        try:
+            follower.position = yield from _tail_file(f, options)
+        except BaseException:
+            f.close()
+            raise
+        follower.attach(f)
+        shown = follower
+    if followers:
+        yield from follow(term, followers, show_headers, shown)
+
+
+class Follower:
+    """A file followed by name: the open file, its identity and how far it has been read"""
+    def __init__(self, name, path):
+        self.name = name
+        self.path = os.path.normpath(path)
+        self.file = None
+        self.identity = None  # (st_dev, st_ino) of the open file
+        self.position = 0
+        self.missing = False
+
+    def attach(self, f):
+        st = os.fstat(f.fileno())
+        self.file = f
+        self.identity = (st.st_dev, st.st_ino)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def read(self, limit):
+        """New data in the open file, up to limit bytes; handles truncation"""
+        chunks = []
+        f = self.file
+        if f is None:
+            return chunks
+        size = os.fstat(f.fileno()).st_size
+        if size < self.position:
+            chunks.append(f"tail: {self.name}: file truncated\n")
+            self.position = 0
+        if size > self.position:
+            f.seek(self.position)
+            data = f.read(min(size - self.position, limit))
+            self.position += len(data)
+            chunks.append(data)
+        return chunks
+
+    def poll(self, limit=FOLLOW_READ):
+        """Chunks to print since the last poll, including rotation notices
+
+        Returns (chunks, more); more is True if data was left unread.
+        """
+        chunks = self.read(limit)
+        if self.file is not None and self.position < os.fstat(self.file.fileno()).st_size:
+            return chunks, True
+        try:
+            st = os.stat(self.path)
+        except OSError as e:
+            if not self.missing:
+                self.missing = True
+                chunks.append(f"tail: '{self.name}' has become inaccessible: {e.strerror}\n")
+                self.close()
+            return chunks, False
+        if (st.st_dev, st.st_ino) == self.identity:
+            return chunks, False
+        # Rotated, or it (re)appeared: whatever was still in the old file has been read
+        try:
+            f = open(self.path, 'rb')
+        except OSError:
+            return chunks, False
+        notice = "has appeared" if self.file is None else "has been replaced"
+        chunks.append(f"tail: '{self.name}' {notice};  following new file\n")
+        self.close()
+        self.attach(f)
+        self.missing = False
+        self.position = 0
+        more_chunks, more = self.poll(limit)
+        return chunks + more_chunks, more
+
+
+def follow(term, followers, show_headers, shown=None):
+    """Print what is appended to the followed files until cancelled
+
+    shown is the follower whose header was printed last.
+    """
+    watcher = _watcher([os.path.dirname(f.path) for f in followers])
+    busy = False
+    try:
+        while not term.cancelled():
+            changed = None if busy else watcher.wait(term)
+            busy = False
+            output = []
+            for follower in followers:
+                if changed is not None and follower.path not in changed:
+                    continue
+                chunks, more = follower.poll()
+                busy = busy or more
+                if not chunks:
+                    continue
+                for chunk in chunks:
+                    if show_headers and follower is not shown and isinstance(chunk, bytes):
+                        output.append(_header(follower.name, False))
+                        shown = follower
+                    output.append(chunk)
+            watcher.settle(bool(output))
+            yield from output
+    finally:
+        watcher.close()
+        for follower in followers:
+            follower.close()
+
+
+def _sleep(term, seconds):
+    """Sleep, waking early if the command is cancelled"""
+    token = term.cancel_token
+    if token is not None:
+        token.event.wait(seconds)
+    else:
+        time.sleep(seconds)
+
+
+class Poller:
+    """Adaptive polling: check often while files change, back off while they don't"""
+    def __init__(self):
+        self.interval = POLL_MIN
+
+    def wait(self, term):
+        """Returns None: every file has to be checked"""
+        _sleep(term, self.interval)
+        return None
+
+    def settle(self, changed):
+        self.interval = POLL_MIN if changed else min(self.interval * 2, POLL_MAX)
+
+    def close(self):
+        pass
+
+
+class Inotify:
+    """Wakes tail -f when something changes in the followed files' directories"""
+    # <sys/inotify.h>
+    IN_MODIFY, IN_ATTRIB, IN_MOVED_FROM, IN_MOVED_TO = 0x2, 0x4, 0x40, 0x80
+    IN_CREATE, IN_DELETE, IN_DELETE_SELF, IN_MOVE_SELF = 0x100, 0x200, 0x400, 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_DELETE_SELF | IN_MOVE_SELF)
+
+    def __init__(self, directories):
+        import ctypes
+        import struct
+        self.event = struct.Struct('iIII')  # wd, mask, cookie, name length
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}  # watch descriptor -> directory
+        try:
+            for directory in set(directories):
+                wd = libc.inotify_add_watch(self.fd, os.fsencode(directory or '.'), self.MASK)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"cannot watch '{directory}'")
+                self.watches[wd] = directory
+        except OSError:
+            os.close(self.fd)
+            raise
+        self.rescan = time.monotonic() + RESCAN_INTERVAL
+
+    def wait(self, term):
+        """Paths that changed, or None when every file should be checked"""
+        import select
+        deadline = time.monotonic() + WAKE_INTERVAL
+        while True:
+            if time.monotonic() >= self.rescan:
+                # A file written through another hard link, or an event queue
+                # overflow, wouldn't show up here
+                self.rescan = time.monotonic() + RESCAN_INTERVAL
+                return None
+            ready, _, _ = select.select([self.fd], [], [], max(0.0, deadline - time.monotonic()))
+            if ready or term.cancelled():
+                break
+            deadline = time.monotonic() + WAKE_INTERVAL
+        changed = set()
+        if not ready:
+            return changed
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.event.unpack_from(data, offset)
+            offset += self.event.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            directory = self.watches.get(wd)
+            if mask & self.IN_Q_OVERFLOW or directory is None or not name:
+                return None
+            changed.add(os.path.join(directory, os.fsdecode(name)))
+        return changed
+
+    def settle(self, changed):
+        pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _watcher(directories):
+    if sys.platform.startswith('linux'):
+        try:
+            return Inotify(directories)
+        except (OSError, AttributeError):
+            pass  # no inotify (old libc, watch limit reached): poll instead
+    return Poller()
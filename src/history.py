@@ -0,0 +1,173 @@
+"""Persistent, bounded, searchable command history
+
+History is kept in an append-only file (one command per line, by default
+~/.winterm/history). At startup only the newest `size` entries are read,
+by memory-mapping the file and scanning backwards from the end, and the
+file is compacted once older entries take up more than half of it.
+
+Searches run over one joined string of all entries, so substring and
+prefix lookups are a single str.find() scan plus a bisect per match. The
+string is built on the first search and then extended as commands are
+added; entries that fall out of the ring are skipped until they make up
+half of it, when it is rebuilt.
+"""
+import os
+import mmap
+import bisect
+import itertools
+from collections import deque
+
+DEFAULT_SIZE = 100000
+BLOCK_SIZE = 1024 * 1024
+
+
+def read_tail(path, count):
+    """Return (last `count` lines of path, byte offset where they start)"""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return [], 0
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return [], 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Count newlines block by block from the end until we have enough
+            end = size - 1 if mm[size - 1:size] == b"\n" else size
+            start = end
+            needed = count
+            while start > 0:
+                block_start = max(0, start - BLOCK_SIZE)
+                newlines = mm[block_start:start].count(b"\n")
+                if newlines < needed:
+                    needed -= newlines
+                    start = block_start
+                    continue
+                # The start of the oldest wanted line is in this block
+                for _ in range(needed):
+                    start = mm.rfind(b"\n", block_start, start)
+                start += 1
+                break
+            data = mm[start:size]
+    return data.decode('utf-8', errors='replace').splitlines(), start
+
+
+class History:
+    """Ring of the most recent commands, mirrored to an append-only file"""
+    def __init__(self, path=None, size=DEFAULT_SIZE):
+        self.path = path
+        self.size = size
+        self.entries = deque(maxlen=size)
+        self.total = 0      # entries ever added, for numbering
+        self.file = None
+        self._reset_index()
+
+    @classmethod
+    def open(cls, data_dir):
+        """Load the session history, honouring WINTERM_HISTFILE/WINTERM_HISTSIZE"""
+        path = os.environ.get('WINTERM_HISTFILE') or os.path.join(data_dir, 'history')
+        size = os.environ.get('WINTERM_HISTSIZE', '')
+        history = cls(path, int(size) if size.isdigit() and int(size) > 0 else DEFAULT_SIZE)
+        history.load()
+        return history
+
+    def load(self):
+        """Read the newest entries from disk, compacting an oversized file"""
+        lines, start = read_tail(self.path, self.size)
+        self.entries.extend(lines)
+        self.total = len(self.entries)
+        self._reset_index()
+        if start and start > os.path.getsize(self.path) // 2:
+            self._rewrite()
+
+    def _reset_index(self):
+        self._lines = None   # entries in the search index, None until a search
+        self._blob = None    # "\n" + the lines joined by "\n" + "\n"
+        self._starts = None  # offset of each line in the blob
+        self._pending = []   # lines added since the blob was last extended
+        self._end = 1        # offset the next line will start at
+        self._dropped = 0    # lines at the front that have left the ring
+
+    def _rewrite(self):
+        """Replace the file with just the entries in memory"""
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, 'w', encoding='utf-8') as f:
+                for line in self.entries:
+                    f.write(line + "\n")
+            os.replace(temp, self.path)
+        except OSError:
+            pass  # keep the old file; it will be compacted next time
+
+    def append(self, line):
+        """Add a command, writing it to the history file straight away"""
+        line = line.replace("\n", " ")
+        if self._lines is not None:
+            if len(self.entries) == self.entries.maxlen:
+                self._dropped += 1
+            if self._dropped > len(self._lines) // 2:
+                self._reset_index()
+            else:
+                self._lines.append(line)
+                self._starts.append(self._end)
+                self._end += len(line) + 1
+                self._pending.append(line)
+        self.entries.append(line)
+        self.total += 1
+        if self.path is None:
+            return
+        try:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(line + "\n")
+            self.file.flush()
+        except OSError:
+            self.path = None  # read-only home etc.: keep history in memory only
+
+    def clear(self):
+        self.entries.clear()
+        self._reset_index()
+        if self.path:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            open(self.path, 'w').close()
+
+    def numbered(self, entries_from=0):
+        """Yield (number, command) for entries starting at index entries_from"""
+        first = self.total - len(self.entries) + 1
+        for i, line in enumerate(itertools.islice(self.entries, entries_from, None), entries_from):
+            yield first + i, line
+
+    def tail(self, count):
+        return self.numbered(max(0, len(self.entries) - count))
+
+    def _index(self):
+        if self._lines is None:
+            self._lines = list(self.entries)
+            self._blob = "\n" + "\n".join(self._lines) + "\n"
+            starts = []
+            position = 1
+            for line in self._lines:
+                starts.append(position)
+                position += len(line) + 1
+            self._starts = starts
+            self._end = position
+        elif self._pending:
+            self._blob += "\n".join(self._pending) + "\n"
+            self._pending = []
+        return self._blob, self._starts, self._lines
+
+    def search(self, text, prefix=False):
+        """Yield (number, command) for entries containing (or starting with) text"""
+        blob, starts, lines = self._index()
+        needle = "\n" + text if prefix else text
+        dropped = self._dropped
+        first = self.total - len(self.entries) + 1 - dropped
+        position = blob.find(needle, starts[dropped] - 1 if dropped < len(starts) else len(blob))
+        while position >= 0:
+            index = bisect.bisect_right(starts, position + (1 if prefix else 0)) - 1
+            yield first + index, lines[index]
+            # Continue after this entry so each one is reported once
+            position = blob.find(needle, starts[index] + len(lines[index]))
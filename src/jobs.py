@@ -0,0 +1,187 @@
+"""Background jobs: `cmd &`, jobs, fg and wait
+
+Each job is a whole pipeline run by a small pool of daemon worker threads.
+A job's stdout and stderr go to its own temporary file (external commands
+write to it directly) and are shown when the job is reported as finished
+at the next prompt, or when it is brought back with `fg`.
+"""
+import os
+import sys
+import queue
+import tempfile
+import threading
+
+import pipeline
+
+MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+class JobOutput:
+    """Per-job output buffer backed by an unnamed temporary file"""
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.lock = threading.Lock()
+        self.encoding = pipeline.text_encoding()
+
+    def write(self, chunk):
+        if isinstance(chunk, pipeline.FileRegion):
+            with self.lock:
+                self.file.flush()
+                pipeline.copy_region(chunk, self.file.fileno())
+            return
+        if isinstance(chunk, str):
+            chunk = chunk.encode(self.encoding)
+        with self.lock:
+            self.file.write(chunk)
+
+    def fileno(self):
+        # Children write here directly; flush so our data lands first
+        self.flush()
+        return self.file.fileno()
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        self.flush()
+
+    def dump(self, stream=None):
+        """Copy everything buffered so far to stream (stdout by default)"""
+        import shutil
+        stream = stream or sys.stdout
+        stream.flush()
+        with self.lock:
+            self.file.flush()
+            self.file.seek(0)
+            shutil.copyfileobj(self.file, stream.buffer)
+            self.file.close()
+        stream.buffer.flush()
+
+
+class Job:
+    """A pipeline running in the background"""
+    def __init__(self, job_id, parsed):
+        self.id = job_id
+        self.pipeline = parsed
+        self.output = JobOutput()
+        self.status = None
+        self.done = threading.Event()
+
+    @property
+    def state(self):
+        if not self.done.is_set():
+            return "Running"
+        return "Done" if self.status == 0 else f"Exit {self.status}"
+
+    def line(self):
+        return f"[{self.id}]  {self.state:<10}  {self.pipeline.text}"
+
+
+class JobTable:
+    """Jobs of one session and the worker threads that run them"""
+    def __init__(self, term, workers=MAX_WORKERS):
+        self.term = term
+        self.jobs = {}
+        self.queue = queue.Queue()
+        self.workers = []
+        self.max_workers = workers
+
+    def submit(self, parsed):
+        """Queue a pipeline to run in the background and return its Job"""
+        job = Job(max(self.jobs, default=0) + 1, parsed)
+        self.jobs[job.id] = job
+        self.queue.put(job)
+        busy = sum(1 for j in self.jobs.values() if not j.done.is_set())
+        if len(self.workers) < min(busy, self.max_workers):
+            worker = threading.Thread(target=self._work, name=f"job-worker-{len(self.workers) + 1}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        return job
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            try:
+                job.status = pipeline.run(self.term, job.pipeline, job.output, errors=job.output,
+                                          background=True)
+            except Exception as e:
+                job.output.write(f"Error: {e}\n")
+                job.status = 1
+            except SystemExit as e:
+                job.status = e.code if isinstance(e.code, int) else 0
+            finally:
+                job.done.set()
+
+    def running(self):
+        return [job for job in self.jobs.values() if not job.done.is_set()]
+
+    def get(self, spec=None):
+        """Look up a job by `N`, `%N` or, with no spec, the most recent one"""
+        if spec is None:
+            return self.jobs[max(self.jobs)] if self.jobs else None
+        spec = spec.lstrip('%')
+        return self.jobs.get(int(spec)) if spec.isdigit() else None
+
+    def finish(self, job):
+        """Remove a finished job, printing its status line and output"""
+        del self.jobs[job.id]
+        print(job.line())
+        job.output.dump()
+
+    def report(self):
+        """Print and forget every job that has finished since the last prompt"""
+        for job in [j for j in self.jobs.values() if j.done.is_set()]:
+            self.finish(job)
+
+
+def table(term):
+    """The session's job table, created on first use"""
+    if term.job_table is None:
+        term.job_table = JobTable(term)
+    return term.job_table
+
+
+def start(term, parsed):
+    """Run a parsed pipeline in the background (`cmd &`)"""
+    job = table(term).submit(parsed)
+    print(f"[{job.id}] started")
+    return job
+
+
+def jobs(term, *args):
+    """List background jobs"""
+    if term.job_table is None or not term.job_table.jobs:
+        return ""
+    return "\n".join(job.line() for job in term.job_table.jobs.values())
+
+
+def fg(term, *args):
+    """Wait for a background job and show its output"""
+    job = table(term).get(args[0] if args else None)
+    if job is None:
+        return term.error(f"fg: {args[0] if args else 'current'}: no such job")
+    print(job.pipeline.text)
+    job.done.wait()
+    term.job_table.jobs.pop(job.id, None)
+    job.output.dump()
+    term.last_status = job.status
+    return ""
+
+
+def wait(term, *args):
+    """Wait for background jobs to finish"""
+    job_table = table(term)
+    if args:
+        waiting = []
+        for spec in args:
+            job = job_table.get(spec)
+            if job is None:
+                return term.error(f"wait: {spec}: no such job", 127)
+            waiting.append(job)
+    else:
+        waiting = list(job_table.jobs.values())
+    for job in waiting:
+        job.done.wait()
+    term.last_status = waiting[-1].status if waiting else 0
+    return ""
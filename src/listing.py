@@ -0,0 +1,242 @@
+"""ls built-in on top of os.scandir
+
+Each directory is read with a single scandir pass. The entry type comes
+from the cached d_type and -l only costs one (cached) stat per entry.
+Output is yielded in batches of lines, and -U skips sorting entirely so
+even directories with millions of entries stream with flat memory.
+-R reads subdirectories ahead in parallel with walker.Walker.
+"""
+import os
+import stat
+import time
+
+BATCH = 1000
+
+
+class FileEntry:
+    """os.DirEntry-alike for a file named on the command line"""
+    __slots__ = ('name', 'st')
+
+    def __init__(self, name, st):
+        self.name = name
+        self.st = st
+
+    def stat(self, follow_symlinks=True):
+        return self.st
+
+
+class Owners:
+    """uid/gid -> name lookups, cached for the whole listing"""
+    def __init__(self):
+        self.users = {}
+        self.groups = {}
+        try:
+            import pwd
+            import grp
+        except ImportError:  # Windows: no uid/gid databases
+            pwd = grp = None
+        self.pwd = pwd
+        self.grp = grp
+
+    def user(self, uid):
+        name = self.users.get(uid)
+        if name is None:
+            name = str(uid)
+            if self.pwd is not None:
+                try:
+                    name = self.pwd.getpwuid(uid).pw_name
+                except KeyError:
+                    pass
+            self.users[uid] = name
+        return name
+
+    def group(self, gid):
+        name = self.groups.get(gid)
+        if name is None:
+            name = str(gid)
+            if self.grp is not None:
+                try:
+                    name = self.grp.getgrgid(gid).gr_name
+                except KeyError:
+                    pass
+            self.groups[gid] = name
+        return name
+
+
+def parse_args(args):
+    """Split ls arguments into a set of flag letters and a list of paths"""
+    flags = set()
+    paths = []
+    for arg in args:
+        if arg.startswith('-') and len(arg) > 1:
+            flags.update(arg[1:])
+        else:
+            paths.append(arg)
+    return flags, paths
+
+
+def ls(term, *args):
+    """List directory contents"""
+    flags, paths = parse_args(args)
+    unknown = flags - set('alStrU1R')
+    if unknown:
+        return term.error(f"ls: invalid option -- '{sorted(unknown)[0]}'")
+    columns = 0
+    if term.tty_output and not flags & set('l1'):
+        columns = _terminal_width()
+    return _ls(term, flags, paths or ['.'], columns)
+
+
+def _ls(term, flags, paths, columns):
+    owners = Owners() if 'l' in flags else None
+    headers = len(paths) > 1 or 'R' in flags
+    first = True
+    for path in paths:
+        full = os.path.join(term.current_dir, path)
+        try:
+            st = os.stat(full)
+        except OSError:
+            yield term.error_line(f"ls: cannot access '{path}': No such file or directory")
+            continue
+        if not stat.S_ISDIR(st.st_mode):
+            # A file argument lists just itself
+            yield from _format([FileEntry(path, st)], flags, owners, columns)
+            first = False
+            continue
+        if 'R' in flags:
+            directories = _walk(term, full, path, flags)
+        else:
+            try:
+                directories = [(path, _read(full, flags), None)]
+            except OSError as e:
+                directories = [(path, (), e)]
+        for name, entries, error in directories:
+            if headers:
+                yield ("" if first else "\n") + f"{name}:\n"
+            first = False
+            if error is not None:
+                yield term.error_line(f"ls: cannot open directory '{name}': {error.strerror}")
+            else:
+                yield from _format(entries, flags, owners, columns)
+
+
+def _read(path, flags):
+    """Entries of one directory: a sorted list, or a lazy iterator for -U"""
+    it = os.scandir(path)  # raises here if the directory can't be read
+    if 'U' in flags:
+        return _streamed(it, flags)
+    with it:
+        return _sort(_visible(it, flags), flags)
+
+
+def _streamed(it, flags):
+    with it:
+        yield from _visible(it, flags)
+
+
+def _walk(term, full, path, flags):
+    """(name, sorted entries, error) for every directory under full, for -R"""
+    from walker import Walker
+    walker = Walker(full, stat=bool(flags & set('lSt')), ordered=True,
+                    sort=lambda entries: _sort(_visible(entries, flags), flags),
+                    cancelled=term.cancelled)
+    for directory in walker:
+        yield path + directory.path[len(full):], directory.entries, directory.error
+
+
+def _visible(entries, flags):
+    """Entries not hidden by the flags, with stat results cached if needed"""
+    show_all = 'a' in flags
+    need_stat = bool(flags & set('lSt'))
+    for entry in entries:
+        if not show_all and entry.name.startswith('.'):
+            continue
+        if need_stat:
+            try:
+                entry.stat(follow_symlinks=False)
+            except OSError:
+                continue  # vanished while listing
+        yield entry
+
+
+def _sort(entries, flags):
+    entries = list(entries)
+    if 'U' in flags:
+        return entries
+    if 'S' in flags:
+        entries.sort(key=lambda e: (-e.stat(follow_symlinks=False).st_size, e.name))
+    elif 't' in flags:
+        entries.sort(key=lambda e: (-e.stat(follow_symlinks=False).st_mtime, e.name))
+    else:
+        entries.sort(key=lambda e: e.name)
+    if 'r' in flags:
+        entries.reverse()
+    return entries
+
+
+def _format(entries, flags, owners, columns):
+    """Yield the listing in batches of lines"""
+    if 'l' in flags:
+        yield from _long(entries, owners)
+    elif columns and isinstance(entries, list):
+        # Columns need every name up front, so unsorted (-U) output stays one per line
+        yield from _columns([e.name for e in entries], columns)
+    else:
+        batch = []
+        for entry in entries:
+            batch.append(entry.name)
+            if len(batch) >= BATCH:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+
+def _long(entries, owners):
+    times = {}  # mtime minute -> formatted, most entries share a few minutes
+    batch = []
+    for entry in entries:
+        st = entry.stat(follow_symlinks=False)
+        minute = int(st.st_mtime) // 60
+        mtime = times.get(minute)
+        if mtime is None:
+            mtime = times[minute] = time.strftime("%b %d %H:%M", time.localtime(st.st_mtime))
+        type_char = 'd' if stat.S_ISDIR(st.st_mode) else ('l' if stat.S_ISLNK(st.st_mode) else '-')
+        perm = oct(st.st_mode)[-3:]
+        batch.append(f"{type_char}{perm} {owners.user(st.st_uid):8} {owners.group(st.st_gid):8} "
+                     f"{st.st_size:8} {mtime} {entry.name}")
+        if len(batch) >= BATCH:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def _columns(names, width):
+    """Lay names out in columns (filled top to bottom) to fit width"""
+    if not names:
+        return
+    cell = max(len(name) for name in names) + 2
+    cols = max(1, width // cell)
+    rows = -(-len(names) // cols)
+    batch = []
+    for row in range(rows):
+        cells = names[row::rows]
+        line = "".join(name.ljust(cell) for name in cells[:-1]) + cells[-1]
+        batch.append(line)
+        if len(batch) >= BATCH:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def _terminal_width():
+    try:
+        return int(os.environ['COLUMNS'])
+    except (KeyError, ValueError):
+        pass
+    try:
+        return os.get_terminal_size().columns
+    except OSError:
+        return 80
@@ -0,0 +1,325 @@
+"""updatedb and locate: a file name database with a trigram index
+
+updatedb walks the configured roots once and writes every path to
+~/.winterm/locate.db (or $WINTERM_LOCATE_DB). The file is laid out as:
+
+    header | roots | path blocks | block offsets | trigram table | postings
+
+Paths are sorted and front-coded in blocks of BLOCK_SIZE: each path is
+stored as the length of the prefix it shares with the previous one plus
+the rest. For every trigram of the lower-cased paths, the postings list
+the blocks that contain it. locate memory-maps the file and intersects
+the postings of the pattern's trigrams (shortest list first, binary
+search in the others), so it only decodes the few blocks that can match.
+"""
+import os
+import mmap
+import struct
+import bisect
+import fnmatch
+from array import array
+
+MAGIC = b"WTLOC\x00\x01\n"
+HEADER = struct.Struct('<8sQQQQQQQ')  # magic, paths, blocks, roots at/size, index at, trigrams at/count
+TRIGRAM = struct.Struct('<IIQ')       # trigram, posting count, postings offset
+BLOCK_SIZE = 64
+DB_FILE = 'locate.db'
+
+
+def database_path(term):
+    return os.environ.get('WINTERM_LOCATE_DB') or os.path.join(term.data_dir, DB_FILE)
+
+
+def _varint(n, out):
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _trigram_key(gram):
+    return int.from_bytes(gram, 'little')
+
+
+def build(paths, roots, target):
+    """Write a database of paths (sorted in place) to target; returns the path count"""
+    paths.sort()
+    blocks = bytearray()
+    offsets = array('Q')
+    postings = {}  # trigram -> array of block numbers
+    header_size = HEADER.size
+    roots_data = "\0".join(roots).encode('utf-8', 'surrogateescape')
+    base = header_size + len(roots_data)
+
+    for number, start in enumerate(range(0, len(paths), BLOCK_SIZE)):
+        offsets.append(base + len(blocks))
+        grams = set()
+        previous = b""
+        lowered_previous = b""
+        for path in paths[start:start + BLOCK_SIZE]:
+            shared = 0
+            limit = min(len(path), len(previous))
+            while shared < limit and path[shared] == previous[shared]:
+                shared += 1
+            _varint(shared, blocks)
+            _varint(len(path) - shared, blocks)
+            blocks += path[shared:]
+            # Trigrams inside the shared prefix were already added for the previous path
+            lowered = path.lower() if path.isascii() else os.fsencode(os.fsdecode(path).lower())
+            first = max(0, shared - 2) if lowered[:shared] == lowered_previous[:shared] else 0
+            grams.update(lowered[i:i + 3] for i in range(first, len(lowered) - 2))
+            previous = path
+            lowered_previous = lowered
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('I')
+            posting.append(number)
+    offsets.append(base + len(blocks))
+
+    temp = f"{target}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    with open(temp, 'wb') as f:
+        f.write(b"\0" * header_size)
+        f.write(roots_data)
+        f.write(blocks)
+        f.write(b"\0" * (-f.tell() % 8))
+        index_at = f.tell()
+        offsets.tofile(f)
+        trigrams_at = f.tell()
+        keys = sorted(postings, key=_trigram_key)
+        postings_at = trigrams_at + TRIGRAM.size * len(keys)
+        table = bytearray()
+        position = postings_at
+        for gram in keys:
+            table += TRIGRAM.pack(_trigram_key(gram), len(postings[gram]), position)
+            position += 4 * len(postings[gram])
+        f.write(table)
+        for gram in keys:
+            postings[gram].tofile(f)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(paths), len(offsets) - 1, header_size, len(roots_data),
+                            index_at, trigrams_at, len(keys)))
+    os.replace(temp, target)
+    return len(paths)
+
+
+class Database:
+    """Read-only, memory-mapped view of a locate database"""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.path_count, self.block_count, roots_at, roots_size,
+         index_at, self.trigrams_at, self.trigram_count) = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError("not a locate database (run updatedb)")
+        self.view = memoryview(self.map)
+        self.offsets = self.view[index_at:index_at + 8 * (self.block_count + 1)].cast('Q')
+        roots = bytes(self.view[roots_at:roots_at + roots_size]).decode('utf-8', 'surrogateescape')
+        self.roots = roots.split("\0") if roots else []
+
+    def close(self):
+        self.offsets.release()
+        self.view.release()
+        self.map.close()
+
+    def postings(self, gram):
+        """Sorted block numbers containing the trigram, as a memoryview of uint32"""
+        key = _trigram_key(gram)
+        low, high = 0, self.trigram_count
+        while low < high:
+            middle = (low + high) // 2
+            found, count, offset = TRIGRAM.unpack_from(self.map, self.trigrams_at + middle * TRIGRAM.size)
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                return self.view[offset:offset + 4 * count].cast('I')
+        return self.view[0:0].cast('I')
+
+    def candidates(self, grams):
+        """Block numbers that contain every trigram in grams (None: all blocks)"""
+        if not grams:
+            return None
+        lists = sorted((self.postings(gram) for gram in grams), key=len)
+        shortest, others = lists[0], lists[1:]
+        blocks = []
+        for number in shortest:
+            for other in others:
+                i = bisect.bisect_left(other, number)
+                if i == len(other) or other[i] != number:
+                    break
+            else:
+                blocks.append(number)
+        return blocks
+
+    def block(self, number):
+        """Decode the paths of one block as bytes"""
+        data = self.map
+        position = self.offsets[number]
+        end = self.offsets[number + 1]
+        previous = b""
+        paths = []
+        while position < end:
+            values = []
+            for _ in range(2):
+                shift = value = 0
+                while True:
+                    byte = data[position]
+                    position += 1
+                    value |= (byte & 0x7f) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+                values.append(value)
+            shared, length = values
+            previous = previous[:shared] + data[position:position + length]
+            position += length
+            paths.append(previous)
+        return paths
+
+
+def _literals(pattern):
+    """Runs of literal text in a glob pattern"""
+    runs = []
+    current = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c in '*?':
+            runs.append("".join(current))
+            current = []
+        elif c == '[':
+            end = pattern.find(']', i + 2)
+            if end < 0:
+                current.append(c)  # fnmatch treats an unclosed [ literally
+            else:
+                runs.append("".join(current))
+                current = []
+                i = end
+        else:
+            current.append(c)
+        i += 1
+    runs.append("".join(current))
+    return runs
+
+
+def _trigrams(text):
+    data = os.fsencode(text.lower())
+    return {data[i:i + 3] for i in range(len(data) - 2)}
+
+
+def updatedb(term, *args):
+    """Index every path under the given roots for locate"""
+    from walker import Walker
+    import time
+
+    target = database_path(term)
+    roots = [os.path.normpath(os.path.join(term.current_dir, root)) for root in args]
+    if not roots:
+        try:
+            database = Database(target)
+            roots = database.roots
+            database.close()
+        except (OSError, ValueError):
+            pass
+    roots = roots or [term.home_dir]
+
+    started = time.perf_counter()
+    paths = []
+    for root in roots:
+        paths.append(os.fsencode(root))
+        for directory in Walker(root, cancelled=term.cancelled):
+            paths.extend(os.fsencode(entry.path) for entry in directory.entries)
+    if term.cancelled():
+        return term.error(f"updatedb: {term.cancel_token.reason}, database not updated", 130)
+    try:
+        count = build(paths, roots, target)
+    except OSError as e:
+        return term.error(f"updatedb: {target}: {e.strerror}")
+    return f"updatedb: {count} paths under {', '.join(roots)} in {time.perf_counter() - started:.1f}s"
+
+
+def locate(term, *args):
+    """Find files by name in the updatedb database"""
+    ignore_case = count_only = False
+    limit = None
+    patterns = []
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg in ('-l', '--limit', '-n'):
+            if not args or not args[0].isdigit():
+                return term.error(f"locate: option '{arg}' requires a number")
+            limit = int(args.pop(0))
+        elif arg.startswith('-') and len(arg) > 1 and set(arg[1:]) <= set('ic'):
+            ignore_case = ignore_case or 'i' in arg
+            count_only = count_only or 'c' in arg
+        else:
+            patterns.append(arg)
+    if not patterns:
+        return term.error("Usage: locate [-i] [-c] [-l N] pattern...")
+
+    try:
+        database = Database(database_path(term))
+    except FileNotFoundError:
+        return term.error("locate: no database, run updatedb first")
+    except (OSError, ValueError) as e:
+        return term.error(f"locate: {e}")
+    return _locate(term, database, patterns, ignore_case, count_only, limit)
+
+
+def _matcher(pattern, ignore_case):
+    """(test for a decoded path, trigrams every match must contain)"""
+    if ignore_case:
+        pattern = pattern.lower()
+    if any(c in pattern for c in '*?['):
+        # Globs must match the whole path, as with GNU locate
+        import re
+        match = re.compile(fnmatch.translate(pattern)).match
+        grams = set().union(*(_trigrams(run) for run in _literals(pattern)))
+        test = lambda path: match(path) is not None
+    else:
+        grams = _trigrams(pattern)
+        test = lambda path: pattern in path
+    if ignore_case:
+        return (lambda path: test(path.lower())), grams
+    return test, grams
+
+
+def _locate(term, database, patterns, ignore_case, count_only, limit):
+    try:
+        matchers = [_matcher(pattern, ignore_case) for pattern in patterns]
+        # A path is shown if it matches any pattern
+        blocks = set()
+        for _, grams in matchers:
+            found = database.candidates(grams)
+            if found is None:
+                blocks = range(database.block_count)
+                break
+            blocks.update(found)
+        tests = [test for test, _ in matchers]
+
+        matched = 0
+        for number in sorted(blocks):
+            if term.cancelled() or (limit is not None and matched >= limit):
+                break
+            lines = []
+            for raw in database.block(number):
+                path = os.fsdecode(raw)
+                if any(test(path) for test in tests):
+                    matched += 1
+                    if not count_only:
+                        lines.append(path)
+                    if limit is not None and matched >= limit:
+                        break
+            if lines:
+                yield "\n".join(lines) + "\n"
+        if count_only:
+            yield f"{matched}\n"
+        if not matched:
+            term.last_status = 1
+    finally:
+        database.close()
@@ -1,11 +1,19 @@
 import sys
 import os
+import _thread
 from com import TerminalCommands
+import pipeline
+
+# Entries preloaded into readline for Ctrl-R; `history -s` searches them all
+READLINE_HISTORY = 1000
 
 class LinuxTerminal:
     def __init__(self):
         self.commands = TerminalCommands()
         self.running = True
+        self.loop = None
+        self.cancel = None   # CancelToken of the foreground command
+        self.waiter = None   # asyncio task waiting for it
         
     def run(self):
         """Main terminal loop"""
@@ -13,8 +21,13 @@ class LinuxTerminal:
         print("Type 'help' for available commands")
         print("Type 'exit' to quit\n")
         
+        self.prepare()
+        
         while self.running:
             try:
+                # Report background jobs that finished since the last prompt
+                self.report_jobs()
+                
                 # Print prompt
                 prompt = self.commands.print_prompt()
                 user_input = input(prompt).strip()
@@ -22,17 +35,12 @@ class LinuxTerminal:
                 if not user_input:
                     continue
                 
-                # Parse command and arguments
-                parts = user_input.split()
-                command = parts[0]
-                args = parts[1:] if len(parts) > 1 else []
+                # Parse command line into pipelines of commands
+                self.commands.add_history(user_input)
                 
-                # Execute command
-                result = self.commands.execute(command, *args)
-                
-                # Print result if not empty
-                if result:
-                    print(result)
+                # Execute, streaming output as it is produced
+                for parsed in pipeline.parse(user_input):
+                    self.execute(parsed)
                     
             except KeyboardInterrupt:
                 print("\nUse 'exit' to quit")
@@ -41,11 +49,258 @@ class LinuxTerminal:
                 self.running = False
             except Exception as e:
                 print(f"Error: {e}")
+    
+    def prepare(self, interactive=None):
+        """Everything run() does before the first prompt, apart from the banner
+
+        interactive forces (or skips) the readline and history setup that
+        otherwise depends on stdin being a terminal.
+        """
+        self.setup_readline(interactive)
+        
+        # Import asyncio while the user types the first command, off the
+        # startup path
+        _thread.start_new_thread(__import__, ('asyncio',))
+    
+    def setup_readline(self, interactive=None):
+        """Enable line editing and Ctrl-R over the most recent history"""
+        if interactive is None:
+            interactive = sys.stdin.isatty()
+        if not interactive:
+            return
+        try:
+            import readline
+        except ImportError:
+            return  # e.g. Windows without pyreadline
+        readline.set_history_length(READLINE_HISTORY)
+        for _, line in self.commands.load_history().tail(READLINE_HISTORY):
+            readline.add_history(line)
+    
+    def execute(self, parsed):
+        """Run one parsed pipeline in the foreground or as a background job"""
+        if parsed.background:
+            import jobs
+            jobs.start(self.commands, parsed)
+            return
+        
+        import asyncio
+        import signal
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+        
+        # While a command runs, Ctrl-C cancels it instead of raising
+        # KeyboardInterrupt in the REPL
+        previous = signal.signal(signal.SIGINT,
+                                 lambda signum, frame: self.loop.call_soon_threadsafe(self.interrupt))
+        try:
+            self.loop.run_until_complete(self.run_foreground(parsed))
+        finally:
+            signal.signal(signal.SIGINT, previous)
+    
+    async def run_foreground(self, parsed):
+        """Run a pipeline on a worker thread as a cancellable task
+
+        `timeout DURATION cmd ...` cancels the command (and kills its external
+        processes) once DURATION has passed; built-ins stop at their next
+        cancellation check and print what they have so far.
+        """
+        import asyncio
+        timeout = None
+        if parsed.stages[0].command == 'timeout':
+            timeout, parsed = self._split_timeout(parsed)
+        
+        cancel = self.cancel = pipeline.CancelToken()
+        self.waiter = asyncio.current_task()
+        worker = _run_in_thread(self.loop, pipeline.run, self.commands, parsed, None, None, cancel)
+        try:
+            status = await asyncio.wait_for(asyncio.shield(worker), timeout)
+            if cancel.is_set() and status == 0:
+                status = 130
+        except asyncio.TimeoutError:
+            cancel.cancel("timed out", kill=True)
+            await worker
+            print(f"timeout: '{parsed.text}' timed out after {timeout:g}s", file=sys.stderr)
+            status = 124
+        except asyncio.CancelledError:
+            # Second Ctrl-C: stop waiting for a command that ignores cancellation
+            print("\n[interrupted, command left running in the background]", file=sys.stderr)
+            status = 130
+        finally:
+            self.cancel = self.waiter = None
+        self.commands.last_status = status
+    
+    def interrupt(self):
+        """Ctrl-C: cancel the running command; a second Ctrl-C stops waiting for it"""
+        if self.cancel is None:
+            return
+        if self.cancel.is_set() and self.waiter is not None:
+            self.waiter.cancel()
+        else:
+            self.cancel.cancel()
+    
+    def _split_timeout(self, parsed):
+        """Strip a leading `timeout DURATION` and return (seconds, pipeline)"""
+        stage = parsed.stages[0]
+        if len(stage.args) < 2:
+            raise ValueError("Usage: timeout DURATION command [args...]")
+        duration = stage.args[0]
+        units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+        scale = units.get(duration[-1:], None)
+        try:
+            seconds = float(duration[:-1] if scale else duration) * (scale or 1)
+        except ValueError:
+            raise ValueError(f"timeout: invalid time interval '{duration}'") from None
+        first = pipeline.Stage(stage.args[1], stage.args[2:], stage.stdout, stage.stderr)
+        return seconds, pipeline.Pipeline([first] + parsed.stages[1:], parsed.text, parsed.background)
+    
+    def report_jobs(self):
+        """Print background jobs that have finished, with their output"""
+        if self.commands.job_table is not None:
+            self.commands.job_table.report()
+    
+    def run_script(self, text, source):
+        """Run a script non-interactively and return the last command's status
+
+        The whole script is parsed into a command plan before anything runs;
+        no banner or prompts are printed.
+        """
+        try:
+            plan = pipeline.parse_script(text)
+        except ValueError as e:
+            print(f"{source}: {e}", file=sys.stderr)
+            return 2
+        
+        for parsed in plan:
+            try:
+                self.execute(parsed)
+            except Exception as e:
+                print(f"Error: {e}", file=sys.stderr)
+                self.commands.last_status = 1
+            self.report_jobs()
+        
+        # Let background jobs finish so their output isn't lost
+        status = self.commands.last_status
+        if self.commands.job_table is not None:
+            for job in list(self.commands.job_table.jobs.values()):
+                job.done.wait()
+            self.report_jobs()
+        return status
+
+def _run_in_thread(loop, func, *args):
+    """Run func on a daemon thread and return an asyncio future for its result
+
+    Unlike loop.run_in_executor, an abandoned command can't keep the
+    process from exiting.
+    """
+    future = loop.create_future()
+    
+    def settle(result, error):
+        if future.cancelled():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    def work():
+        try:
+            result = func(*args)
+        except BaseException as e:
+            loop.call_soon_threadsafe(settle, None, e)
+        else:
+            loop.call_soon_threadsafe(settle, result, None)
+    
+    _thread.start_new_thread(work, ())
+    return future
+
+def startup_bench(runs=5):
+    """Report time to first prompt and per-module import cost"""
+    import subprocess
+    import tempfile
+    import time
+    
+    cmd = [sys.executable]
+    if not getattr(sys, 'frozen', False):
+        cmd += ['-X', 'importtime', os.path.abspath(__file__)]
+    cmd.append('--startup-probe')
+    
+    timings = []
+    modules = {}
+    for _ in range(runs):
+        with tempfile.TemporaryFile('w+') as err:
+            start = time.perf_counter()
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, text=True)
+            proc.stdout.readline()  # the probe writes one line once its prompt is ready
+            timings.append(time.perf_counter() - start)
+            proc.communicate()
+            err.seek(0)
+            for line in err:
+                # import time: self [us] | cumulative | imported package
+                if not line.startswith('import time:') or 'self [us]' in line:
+                    continue
+                self_us, cumulative_us, name = line[len('import time:'):].split('|')
+                modules.setdefault(name.rstrip(), []).append((int(self_us), int(cumulative_us)))
+    
+    timings.sort()
+    print(f"Time to first prompt (with readline and history loaded) over {runs} runs: "
+          f"median {timings[len(timings) // 2] * 1000:.1f} ms, "
+          f"min {timings[0] * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms")
+    if not modules:
+        return
+    
+    rows = []
+    for name, samples in modules.items():
+        self_times = sorted(s for s, _ in samples)
+        cumulative_times = sorted(c for _, c in samples)
+        rows.append((self_times[len(self_times) // 2], cumulative_times[len(cumulative_times) // 2], name))
+    rows.sort(reverse=True)
+    print(f"\nSlowest imports (median of {runs} runs, {len(rows)} modules):")
+    print(" self [us] | cumulative | imported package")
+    for self_us, cumulative_us, name in rows[:25]:
+        print(f"{self_us:10} | {cumulative_us:10} | {name}")
+    print(f"{sum(r[0] for r in rows):10} | {'':10} | total")
 
 def main():
+    if getattr(sys, 'frozen', False):
+        # grep's worker processes re-run this executable; let them start up
+        import multiprocessing
+        multiprocessing.freeze_support()
+    
     # Set up environment for better terminal experience
     os.environ['TERM'] = 'xterm-256color'
     
+    if '--startup-bench' in sys.argv:
+        index = sys.argv.index('--startup-bench')
+        runs = sys.argv[index + 1] if index + 1 < len(sys.argv) else '5'
+        startup_bench(int(runs) if runs.isdigit() else 5)
+        return
+    
+    if '--startup-probe' in sys.argv:
+        # Used by --startup-bench: go through run()'s setup, including
+        # readline and the history load, as far as the first prompt
+        terminal = LinuxTerminal()
+        terminal.prepare(interactive=True)
+        terminal.report_jobs()
+        terminal.commands.print_prompt()
+        print("ready", flush=True)
+        return
+    
+    # main.py -c "commands" / main.py script.wt: run without the REPL
+    args = sys.argv[1:]
+    if args and args[0] == '-c':
+        if len(args) < 2:
+            print("main.py: -c: option requires an argument", file=sys.stderr)
+            sys.exit(2)
+        sys.exit(LinuxTerminal().run_script(args[1], '-c'))
+    if args:
+        try:
+            with open(args[0], encoding='utf-8') as f:
+                text = f.read()
+        except OSError as e:
+            print(f"main.py: {args[0]}: {e.strerror}", file=sys.stderr)
+            sys.exit(127)
+        sys.exit(LinuxTerminal().run_script(text, args[0]))
+    
     # Create and run terminal
     terminal = LinuxTerminal()
     terminal.run()
@@ -0,0 +1,589 @@
+"""Command line parsing, streaming pipelines and output redirection
+
+A built-in may return None, a string, or an iterator of str/bytes chunks.
+Iterators are pulled lazily by the next stage, so `cat big.log | grep ERROR`
+never holds more than one chunk of the file in memory. External commands
+are connected to each other with OS pipes and fed from / read into
+built-ins by small helper threads. An external last stage writes straight
+to the terminal (or file) it inherits, so its output streams live.
+Redirected output (`>`, `>>`, `2>`) is written through a buffered binary
+file, or handed to an external command as its stdout/stderr file
+descriptor so the data never enters Python.
+
+Built-ins may also yield FileRegions (byte ranges of open files, see cat).
+Sinks with a file descriptor copy those with os.sendfile, so file data
+goes to the terminal, a file or an external command without passing
+through Python; everything else reads them in chunks.
+
+A running pipeline can be stopped with a CancelToken: output stops at the
+next chunk, built-ins see term.cancelled() and external commands can be
+killed.
+"""
+import os
+import sys
+
+CHUNK_SIZE = 64 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+REGION_STEP = 16 * 1024 * 1024  # FileRegions are written in steps this big, to stay cancellable
+
+REDIRECTS = ('>', '>>', '2>', '2>>')
+
+
+class CancelToken:
+    """Cooperative cancellation of one running pipeline (Ctrl-C, timeouts)"""
+    def __init__(self):
+        import threading
+        self.event = threading.Event()
+        self.processes = []
+        self.reason = None
+
+    def is_set(self):
+        return self.event.is_set()
+
+    def cancel(self, reason="interrupted", kill=False):
+        """Ask the pipeline to stop; kill=True also kills its external commands
+
+        On Ctrl-C the terminal already delivers SIGINT to foreground children,
+        so they are left to handle it themselves.
+        """
+        self.reason = self.reason or reason
+        self.event.set()
+        if kill:
+            for proc in list(self.processes):
+                proc.kill()
+
+
+class FileRegion:
+    """count bytes of an open binary file, starting at offset"""
+    __slots__ = ('file', 'offset', 'count')
+
+    def __init__(self, file, offset, count):
+        self.file = file
+        self.offset = offset
+        self.count = count
+
+    def chunks(self):
+        """Read the region in CHUNK_SIZE pieces"""
+        self.file.seek(self.offset)
+        remaining = self.count
+        while remaining > 0:
+            data = self.file.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break  # the file shrank
+            remaining -= len(data)
+            yield data
+
+    def split(self, size):
+        end = self.offset + self.count
+        for offset in range(self.offset, end, size):
+            yield FileRegion(self.file, offset, min(size, end - offset))
+
+
+def copy_region(region, fd):
+    """Write a FileRegion to a file descriptor, with os.sendfile where possible"""
+    import errno
+
+    offset = region.offset
+    end = offset + region.count
+    if hasattr(os, 'sendfile'):
+        source = region.file.fileno()
+        try:
+            while offset < end:
+                sent = os.sendfile(fd, source, offset, end - offset)
+                if not sent:
+                    return  # the file shrank
+                offset += sent
+            return
+        except OSError as e:
+            # Some targets (O_APPEND files, non-sockets on macOS) can't take
+            # sendfile; copy those below
+            if offset != region.offset or e.errno not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK,
+                                                          errno.EOPNOTSUPP):
+                raise
+    for chunk in FileRegion(region.file, offset, end - offset).chunks():
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(fd, view):]
+
+
+def _split_regions(chunks):
+    """Pass chunks through, cutting FileRegions into REGION_STEP pieces"""
+    for chunk in chunks:
+        if isinstance(chunk, FileRegion):
+            yield from chunk.split(REGION_STEP)
+        else:
+            yield chunk
+
+
+class Operator(str):
+    """A shell operator token such as '|' or '>' (as opposed to a quoted word)"""
+
+
+class Stage:
+    """One command of a pipeline
+
+    stdout/stderr are None or a (path, append) redirection target.
+    """
+    def __init__(self, command, args, stdout=None, stderr=None):
+        self.command = command
+        self.args = args
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+class Pipeline:
+    """Commands connected by '|', optionally run in the background ('&')"""
+    def __init__(self, stages, text="", background=False):
+        self.stages = stages
+        self.text = text
+        self.background = background
+
+
+def tokenize(line):
+    """Split a command line into words and operators
+
+    Single and double quotes group words; backslashes are kept as-is so
+    Windows paths don't need escaping.
+    """
+    tokens = []
+    word = []
+    in_word = False
+    quoted = False
+    quote = None
+    i = 0
+    while i < len(line):
+        c = line[i]
+        i += 1
+        if quote:
+            if c == quote:
+                quote = None
+            else:
+                word.append(c)
+        elif c in "\"'":
+            quote = c
+            in_word = quoted = True
+        elif c.isspace() or c in '|;&>':
+            op = c
+            if c == '>':
+                # `2>` only when the 2 is a bare word of its own
+                if word == ['2'] and not quoted:
+                    op, word, in_word = '2>', [], False
+                if line[i:i + 1] == '>':
+                    op += '>'
+                    i += 1
+            if in_word:
+                tokens.append("".join(word))
+                word = []
+                in_word = quoted = False
+            if not op.isspace():
+                tokens.append(Operator(op))
+        else:
+            word.append(c)
+            in_word = True
+    if quote:
+        raise ValueError(f"unterminated {quote} quote")
+    if in_word:
+        tokens.append("".join(word))
+    return tokens
+
+
+def parse(line):
+    """Parse a command line into a list of Pipelines separated by ';' or '&'"""
+    pipelines = []
+    tokens = []
+    for token in tokenize(line) + [Operator(';')]:
+        if token in (';', '&') and isinstance(token, Operator):
+            if tokens:
+                pipelines.append(_build(tokens, background=token == '&'))
+            elif token == '&':
+                raise ValueError("syntax error near unexpected token '&'")
+            tokens = []
+        else:
+            tokens.append(token)
+    return pipelines
+
+
+def parse_script(text):
+    """Parse a whole script into a command plan (a flat list of Pipelines)
+
+    Blank lines and lines starting with '#' are skipped. Errors name the
+    offending line so nothing runs if any line is malformed.
+    """
+    plan = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            plan.extend(parse(line))
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from None
+    return plan
+
+
+def _build(tokens, background=False):
+    """Build a Pipeline from the tokens of one ';'-separated command"""
+    stages = []
+    words = []
+    redirects = {}
+    text = _format(tokens)
+    tokens = tokens + [Operator('|')]
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        i += 1
+        if token in REDIRECTS and isinstance(token, Operator):
+            if i >= len(tokens) or isinstance(tokens[i], Operator):
+                raise ValueError(f"syntax error near unexpected token '{token}'")
+            stream = 'stderr' if token.startswith('2') else 'stdout'
+            redirects[stream] = (tokens[i], token.endswith('>>'))
+            i += 1
+        elif isinstance(token, Operator):
+            if not words:
+                raise ValueError(f"syntax error near unexpected token '{token}'")
+            stages.append(Stage(words[0], words[1:], **redirects))
+            words = []
+            redirects = {}
+        else:
+            words.append(token)
+
+    for stage in stages[:-1]:
+        if stage.stdout:
+            raise ValueError("output redirection is only supported on the last command of a pipeline")
+    return Pipeline(stages, text, background)
+
+
+def _format(tokens):
+    """Turn tokens back into command line text (used to describe jobs)"""
+    words = []
+    for token in tokens:
+        if not isinstance(token, Operator) and (not token or any(c.isspace() or c in "|;&>'\"" for c in token)):
+            quote = "'" if '"' in token else '"'
+            token = f"{quote}{token}{quote}"
+        words.append(token)
+    return " ".join(words)
+
+
+def iter_chunks(result):
+    """Normalise a built-in's return value into an iterator of chunks"""
+    if result is None or result == "":
+        return iter(())
+    if isinstance(result, str):
+        # Whole-string results are printed like print() would
+        return iter((result + "\n",))
+    if isinstance(result, bytes):
+        return iter((result, b"\n"))
+    return iter(result)
+
+
+def iter_bytes(chunks):
+    """Turn a stream of str, bytes and FileRegion chunks into bytes chunks"""
+    encoding = text_encoding()
+    for chunk in _read_regions(chunks):
+        yield chunk.encode(encoding) if isinstance(chunk, str) else chunk
+
+
+def _read_regions(chunks):
+    """Pass chunks through, reading FileRegions into bytes"""
+    for chunk in chunks:
+        if isinstance(chunk, FileRegion):
+            yield from chunk.chunks()
+        else:
+            yield chunk
+
+
+def iter_byte_lines(chunks):
+    """Iterate over the lines of a stream of chunks as bytes, with line endings"""
+    pending = b""
+    for chunk in iter_bytes(chunks):
+        if not chunk:
+            continue
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if pending:
+        yield pending
+
+
+def iter_lines(chunks):
+    """Iterate over the text lines of a stream of str or bytes chunks"""
+    import codecs
+    decoder = codecs.getincrementaldecoder(text_encoding())(errors='replace')
+    pending = ""
+    for chunk in _read_regions(chunks):
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        if not chunk:
+            continue
+        lines = (pending + chunk).splitlines(keepends=True)
+        pending = "" if lines[-1].endswith(("\n", "\r")) else lines.pop()
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+class Output:
+    """Destination for the final stage of a pipeline (the terminal by default)"""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def write(self, chunk):
+        if isinstance(chunk, str):
+            self.stream.write(chunk)
+        elif isinstance(chunk, FileRegion):
+            self.stream.flush()
+            fd = _output_fd(self.stream)
+            if fd is None:
+                for data in chunk.chunks():
+                    self.stream.buffer.write(data)
+            else:
+                copy_region(chunk, fd)
+        else:
+            self.stream.flush()
+            self.stream.buffer.write(chunk)
+
+    def fileno(self):
+        self.stream.flush()
+        return self.stream.fileno()
+
+    def isatty(self):
+        return self.stream.isatty()
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class FileOutput:
+    """Buffered binary writer used for `>` and `>>`"""
+    def __init__(self, path, append=False):
+        self.file = open(path, 'ab' if append else 'wb', buffering=WRITE_BUFFER_SIZE)
+        self.encoding = text_encoding()
+
+    def write(self, chunk):
+        if isinstance(chunk, FileRegion):
+            self.file.flush()
+            copy_region(chunk, self.file.fileno())
+        else:
+            self.file.write(chunk.encode(self.encoding) if isinstance(chunk, str) else chunk)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run(term, pipeline, output=None, errors=None, cancel=None, background=False):
+    """Run a parsed pipeline, streaming the last stage into output
+
+    errors, if given, receives external commands' stderr (unless it is
+    redirected with 2>) instead of the terminal; a built-in's 2> target
+    receives its term.error() messages. cancel is an optional CancelToken.
+    background starts external commands detached from the terminal (see
+    external.start). Returns the exit status of the last stage.
+    """
+    last = pipeline.stages[-1]
+    if last.stdout:
+        path, append = last.stdout
+        output = FileOutput(os.path.join(term.current_dir, path), append)
+    else:
+        output = output or Output()
+    term.last_status = 0
+    term.cancel_token = cancel
+    try:
+        return _run(term, pipeline, output, errors, cancel, background)
+    finally:
+        term.cancel_token = None
+        term.tty_output = False
+        term.error_output = None
+        output.close()
+
+
+def _run(term, pipeline, output, errors, cancel, background):
+    import external
+
+    processes = []
+    feeders = []
+    error_files = []
+    stream = None      # chunk iterator produced by the previous built-in
+    upstream = None    # previous external process, if any
+    status = None      # exit status of an external last stage
+    try:
+        for stage in pipeline.stages:
+            handler = term.commands.get(stage.command)
+            if handler is not None:
+                term.tty_output = stage is pipeline.stages[-1] and _isatty(output)
+                target = None
+                if stage.stderr:
+                    path, append = stage.stderr
+                    target = open(os.path.join(term.current_dir, path), 'ab' if append else 'wb')
+                    error_files.append(target)
+                piped = stream is not None or upstream is not None
+                term.error_output = target
+                try:
+                    if piped and stage.command in term.stdin_commands:
+                        if upstream is not None:
+                            stream = _read_process(upstream)
+                        result = handler(*stage.args, stdin=stream)
+                    else:
+                        if upstream is not None:
+                            upstream.stdout.close()  # nobody reads it; the writer gets EPIPE
+                        result = handler(*stage.args)
+                finally:
+                    term.error_output = None
+                stream = _with_errors(term, iter_chunks(result), target)
+                upstream = None
+                status = None
+                continue
+
+            if upstream is not None:
+                stdin = upstream.stdout
+            elif stream is not None:
+                stdin = external.PIPE
+            else:
+                stdin = None
+            stdout = external.PIPE
+            if stage is pipeline.stages[-1]:
+                # The child writes the terminal or redirect target itself
+                stdout = _output_fd(output) or external.PIPE
+            stderr = _output_fd(errors) if errors is not None else None
+            if stage.stderr:
+                path, append = stage.stderr
+                stderr = open(os.path.join(term.current_dir, path), 'ab' if append else 'wb')
+                error_files.append(stderr)
+            try:
+                proc = external.start([stage.command] + list(stage.args), term.current_dir,
+                                      stdin, stdout, stderr, background)
+            except FileNotFoundError:
+                message = f"Command not found: {stage.command}\n"
+                if stage.stderr:
+                    stderr.write(message.encode(text_encoding()))
+                else:
+                    (errors or sys.stderr).write(message)
+                stream, upstream, status = iter(()), None, 127
+                continue
+            if upstream is not None:
+                upstream.stdout.close()  # the child holds its own copy now
+            elif stream is not None:
+                feeders.append(_feed_process(stream, proc, cancel))
+            processes.append(proc)
+            if cancel is not None:
+                cancel.processes.append(proc)
+            upstream, stream = proc, None
+
+        if upstream is not None and upstream.stdout is not None:
+            stream = _read_process(upstream)
+        elif upstream is not None:
+            stream = iter(())
+        for chunk in _split_regions(stream):
+            output.write(chunk)
+            if cancel is not None and cancel.is_set():
+                break
+    except BaseException:
+        for proc in processes:
+            proc.kill()
+        raise
+    finally:
+        output.flush()
+        for thread in feeders:
+            thread.join()
+        for proc in processes:
+            if proc.stdout:
+                proc.stdout.close()
+            proc.wait()
+        for f in error_files:
+            f.close()
+
+    # An external last stage decides the status; otherwise it is non-zero
+    # if any built-in in the pipeline reported an error
+    if upstream is not None:
+        status = upstream.returncode
+    if status is not None:
+        term.last_status = status
+    return term.last_status
+
+
+def _with_errors(term, chunks, target):
+    """Pass a built-in's chunks through with its 2> target set while it runs
+
+    Built-in stages are generators that run interleaved, so the target is
+    set around each step and the previous one put back afterwards.
+    """
+    end = object()
+    while True:
+        previous = term.error_output
+        term.error_output = target
+        try:
+            chunk = next(chunks, end)
+        finally:
+            term.error_output = previous
+        if chunk is end:
+            return
+        yield chunk
+
+
+def _output_fd(output):
+    """File descriptor behind output, or None if it only accepts writes"""
+    try:
+        return output.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _isatty(output):
+    """True if output is an interactive terminal (e.g. for column layouts)"""
+    try:
+        return output.isatty()
+    except AttributeError:
+        return False
+
+
+def _read_process(proc):
+    """Yield a process's stdout as raw byte chunks"""
+    read = proc.stdout.read1
+    while True:
+        chunk = read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _feed_process(chunks, proc, cancel=None):
+    """Copy a chunk iterator into a process's stdin on a helper thread"""
+    import threading
+
+    def feed():
+        encoding = text_encoding()
+        try:
+            for chunk in _split_regions(chunks):
+                if isinstance(chunk, FileRegion):
+                    proc.stdin.flush()
+                    copy_region(chunk, proc.stdin.fileno())
+                else:
+                    proc.stdin.write(chunk.encode(encoding) if isinstance(chunk, str) else chunk)
+                if cancel is not None and cancel.is_set():
+                    break
+        except (BrokenPipeError, OSError):
+            pass  # the reader went away (e.g. `head`), stop producing
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=feed, daemon=True)
+    thread.start()
+    return thread
+
+
+def text_encoding():
+    import locale
+    return locale.getpreferredencoding(False)
@@ -0,0 +1,134 @@
+"""GitHub download commands: git_clone, download_release"""
+import os
+import json
+import tarfile
+import zipfile
+import urllib.request
+import shutil
+
+
+def git_clone(term, *args):
+    """Clone a Git repository"""
+    if not args:
+        return term.error("Usage: git_clone [repository_url]")
+    
+    url = args[0]
+    repo_name = url.split('/')[-1]
+    if repo_name.endswith('.git'):
+        repo_name = repo_name[:-4]
+    
+    target_dir = os.path.join(term.current_dir, repo_name)
+    
+    try:
+        # For GitHub, we can use the API for public repos
+        if 'github.com' in url:
+            api_url = url.replace('github.com', 'api.github.com/repos').replace('.git', '')
+            if not api_url.startswith('http'):
+                api_url = 'https://' + api_url
+            
+            # Get repository info
+            with urllib.request.urlopen(api_url) as response:
+                repo_data = json.loads(response.read())
+                default_branch = repo_data.get('default_branch', 'main')
+                clone_url = repo_data.get('clone_url', url)
+            
+            # Download as zip
+            zip_url = f"{url.replace('.git', '')}/archive/refs/heads/{default_branch}.zip"
+            
+            print(f"Cloning into '{repo_name}'...")
+            zip_path = os.path.join(term.current_dir, f"{repo_name}.zip")
+            
+            # Download zip file
+            with urllib.request.urlopen(zip_url) as response, open(zip_path, 'wb') as out_file:
+                shutil.copyfileobj(response, out_file)
+            
+            # Extract zip file
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                zip_ref.extractall(term.current_dir)
+            
+            # Remove zip file
+            os.remove(zip_path)
+            
+            # Rename extracted directory
+            extracted_dir = os.path.join(term.current_dir, f"{repo_name}-{default_branch}")
+            if os.path.exists(extracted_dir):
+                if os.path.exists(target_dir):
+                    shutil.rmtree(target_dir)
+                os.rename(extracted_dir, target_dir)
+            
+            return f"Repository cloned to {target_dir}"
+        else:
+            return term.error("Currently only GitHub repositories are supported")
+    except Exception as e:
+        return term.error(f"Error cloning repository: {e}")
+
+
+def download_release(term, *args):
+    """Download a GitHub release"""
+    if not args:
+        return term.error("Usage: download_release [owner/repo] [tag?]")
+    
+    repo = args[0]
+    tag = args[1] if len(args) > 1 else 'latest'
+    
+    try:
+        if tag == 'latest':
+            api_url = f"https://api.github.com/repos/{repo}/releases/latest"
+        else:
+            api_url = f"https://api.github.com/repos/{repo}/releases/tags/{tag}"
+        
+        with urllib.request.urlopen(api_url) as response:
+            release_data = json.loads(response.read())
+        
+        # Find asset (prefer source code)
+        asset = None
+        for a in release_data.get('assets', []):
+            if 'source' in a['name'].lower() or 'src' in a['name'].lower():
+                asset = a
+                break
+        
+        if not asset and release_data.get('assets'):
+            asset = release_data['assets'][0]
+        
+        if asset:
+            download_url = asset['browser_download_url']
+            filename = asset['name']
+            
+            print(f"Downloading {filename}...")
+            filepath = os.path.join(term.current_dir, filename)
+            
+            with urllib.request.urlopen(download_url) as response, open(filepath, 'wb') as out_file:
+                shutil.copyfileobj(response, out_file)
+            
+            # Extract if it's an archive
+            if filename.endswith('.zip'):
+                with zipfile.ZipFile(filepath, 'r') as zip_ref:
+                    zip_ref.extractall(term.current_dir)
+                os.remove(filepath)
+                return f"Release extracted to {term.current_dir}"
+            elif filename.endswith('.tar.gz') or filename.endswith('.tgz'):
+                with tarfile.open(filepath, 'r:gz') as tar_ref:
+                    tar_ref.extractall(term.current_dir)
+                os.remove(filepath)
+                return f"Release extracted to {term.current_dir}"
+            else:
+                return f"Release downloaded to {filepath}"
+        else:
+            # Fallback to source code zip
+            source_url = f"https://github.com/{repo}/archive/refs/tags/{release_data['tag_name']}.zip"
+            filename = f"{repo.split('/')[1]}-{release_data['tag_name']}.zip"
+            
+            print(f"Downloading source code...")
+            filepath = os.path.join(term.current_dir, filename)
+            
+            with urllib.request.urlopen(source_url) as response, open(filepath, 'wb') as out_file:
+                shutil.copyfileobj(response, out_file)
+            
+            with zipfile.ZipFile(filepath, 'r') as zip_ref:
+                zip_ref.extractall(term.current_dir)
+            
+            os.remove(filepath)
+            return f"Source code extracted to {term.current_dir}"
+            
+    except Exception as e:
+        return term.error(f"Error downloading release: {e}")
@@ -0,0 +1,403 @@
+"""sort built-in: external merge sort with bounded memory
+
+Input is read in large blocks and split into lines as bytes, so lines are
+compared byte by byte (like LC_ALL=C sort) and never decoded. Lines are
+collected until the buffer (-S) is full; if the whole input fits, it is
+sorted in memory and printed. Otherwise each buffer-full is sorted into a
+run in a temporary file and the runs are merged with heapq.merge, at most
+MERGE_FANIN files at a time, so memory stays bounded by -S however big the
+input is.
+
+With --parallel N, once the input has overflowed the buffer, the runs
+after the first are sorted on a pool of N processes while the next one is
+being read. A run on the pool is held twice, here until it is done and in
+the worker sorting it, so these runs are cut to a 1/(2N) share of the
+buffer, with at most N of them in flight counting the one being read.
+That keeps the total within about -S.
+
+Fields for -k are separated by -t, or by runs of blanks (leading blanks
+are not part of a field, as with GNU sort -b).
+"""
+import os
+import re
+
+USAGE = ("Usage: sort [-nru] [-t SEP] [-k POS1[,POS2]] [-S SIZE] [--parallel N] "
+         "[-T DIR] [file...]")
+DEFAULT_BUFFER = 256 * 1024 * 1024
+MIN_BUFFER = 1024 * 1024
+READ_BLOCK = 4 * 1024 * 1024
+LINE_OVERHEAD = 100   # estimated bytes of memory per line besides its text
+MERGE_FANIN = 32
+OUTPUT_BATCH = 10000  # lines per output chunk
+SIZE_SUFFIXES = {'b': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+NUMBER = re.compile(rb"[ \t]*(-?(?:\d+\.?\d*|\.\d+))")
+
+
+class Key:
+    """A -k sort key: fields (1-based) and characters within them, and its ordering options"""
+    def __init__(self, start_field, start_char=1, end_field=None, end_char=0):
+        self.start_field = start_field
+        self.start_char = start_char
+        self.end_field = end_field
+        self.end_char = end_char  # 0: to the end of the end field
+        self.numeric = None       # None: use the global option
+        self.reverse = None
+
+
+class Options:
+    """Parsed sort command line (picklable, for the worker processes)"""
+    def __init__(self):
+        self.numeric = False
+        self.reverse = False
+        self.unique = False
+        self.separator = None
+        self.keys = []
+        self.buffer = DEFAULT_BUFFER
+        self.parallel = min(8, os.cpu_count() or 1)
+        self.temp_dir = None
+
+
+def _position(text, option):
+    """Parse F[.C][opts] from a -k argument into (field, char, opts)"""
+    match = re.fullmatch(r"(\d+)(?:\.(\d+))?([nr]*)", text)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"invalid key '{option}'")
+    return int(match.group(1)), int(match.group(2) or 0), match.group(3)
+
+
+def parse_key(text):
+    start, _, end = text.partition(',')
+    field, char, opts = _position(start, text)
+    key = Key(field, char or 1)
+    if end:
+        key.end_field, key.end_char, end_opts = _position(end, text)
+        opts += end_opts
+    if opts:
+        key.numeric = 'n' in opts
+        key.reverse = 'r' in opts
+    return key
+
+
+def parse_size(text):
+    match = re.fullmatch(r"(\d+)([bKMGT]?)", text)
+    if not match:
+        raise ValueError(f"invalid -S argument '{text}'")
+    # Like GNU sort, a bare number is in KiB
+    return max(MIN_BUFFER, int(match.group(1)) * SIZE_SUFFIXES[match.group(2) or 'K'])
+
+
+def parse_args(args):
+    """Return (Options, files); raises ValueError on bad arguments"""
+    options = Options()
+    files = []
+    args = list(args)
+    i = 0
+
+    def value(option, inline):
+        nonlocal i
+        if inline:
+            return inline
+        if i >= len(args):
+            raise ValueError(f"option requires an argument -- '{option}'")
+        i += 1
+        return args[i - 1]
+
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg.startswith('--parallel'):
+            text = arg.partition('=')[2] or value('parallel', None)
+            if not text.isdigit() or int(text) < 1:
+                raise ValueError(f"invalid number after '--parallel': '{text}'")
+            options.parallel = int(text)
+        elif arg.startswith('--'):
+            raise ValueError(f"unrecognized option '{arg}'")
+        elif arg.startswith('-') and len(arg) > 1:
+            j = 1
+            while j < len(arg):
+                flag = arg[j]
+                j += 1
+                if flag == 'n':
+                    options.numeric = True
+                elif flag == 'r':
+                    options.reverse = True
+                elif flag == 'u':
+                    options.unique = True
+                elif flag in 'tkST':
+                    text = value(flag, arg[j:])
+                    j = len(arg)
+                    if flag == 't':
+                        if len(text) != 1:
+                            raise ValueError(f"multi-character tab '{text}'")
+                        options.separator = text
+                    elif flag == 'k':
+                        options.keys.append(parse_key(text))
+                    elif flag == 'S':
+                        options.buffer = parse_size(text)
+                    else:
+                        options.temp_dir = text
+                else:
+                    raise ValueError(f"invalid option -- '{flag}'")
+        else:
+            files.append(arg)
+    return options, files
+
+
+def _number(text):
+    match = NUMBER.match(text)
+    if match is None:
+        return 0
+    number = match.group(1)
+    return float(number) if b"." in number else int(number)
+
+
+class _Reversed:
+    """Inverts the order of a key part (a -k key with its own r)"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _field_getter(key, separator):
+    start = key.start_field - 1
+    joiner = separator if separator is not None else b" "
+
+    def text(line):
+        fields = line.split(separator)
+        if start >= len(fields):
+            return b""
+        end = len(fields) if key.end_field is None else min(key.end_field, len(fields))
+        part = fields[start:end]
+        if not part:
+            return b""
+        if key.end_char and key.end_field is not None and key.end_field <= len(fields):
+            part[-1] = part[-1][:key.end_char]
+        if key.start_char > 1:
+            part[0] = part[0][key.start_char - 1:]
+        return joiner.join(part)
+    return text
+
+
+def sort_key(options, last_resort=True):
+    """Key function for a line, or None to compare lines as they are
+
+    With last_resort, lines whose keys are equal are ordered by the whole
+    line, as GNU sort does unless -u is given.
+    """
+    if not options.keys:
+        if not options.numeric:
+            return None
+        if last_resort:
+            return lambda line: (_number(line), line)
+        return _number
+
+    import pipeline
+    separator = options.separator.encode(pipeline.text_encoding()) if options.separator else None
+    parts = []
+    for key in options.keys:
+        text = _field_getter(key, separator)
+        numeric = options.numeric if key.numeric is None else key.numeric
+        reverse = key.reverse is not None and key.reverse != options.reverse
+        get = (lambda line, text=text: _number(text(line))) if numeric else text
+        if reverse:
+            get = (lambda line, get=get: _Reversed(get(line)))
+        parts.append(get)
+    if last_resort:
+        return lambda line: tuple(get(line) for get in parts) + (line,)
+    return lambda line: tuple(get(line) for get in parts)
+
+
+def _unique(lines, key):
+    """Drop lines whose key equals the previous line's"""
+    previous = object()
+    for line in lines:
+        current = line if key is None else key(line)
+        if current != previous:
+            previous = current
+            yield line
+
+
+def sort_lines(lines, options):
+    """Sort a list of lines in place; returns the lines to output"""
+    key = sort_key(options, last_resort=not options.unique)
+    lines.sort(key=key, reverse=options.reverse)
+    if options.unique:
+        return list(_unique(lines, key))
+    return lines
+
+
+def sort_run(lines, options, path):
+    """Sort lines into a run file at path (runs in the worker processes)"""
+    lines = sort_lines(lines, options)
+    with open(path, 'wb') as f:
+        for start in range(0, len(lines), OUTPUT_BATCH):
+            f.write(b"\n".join(lines[start:start + OUTPUT_BATCH]) + b"\n")
+    return path
+
+
+def _read_run(path):
+    with open(path, 'rb', buffering=1024 * 1024) as f:
+        for line in f:
+            yield line[:-1]
+
+
+def merge(paths, options):
+    """Merge sorted run files into one stream of lines"""
+    import heapq
+    key = sort_key(options, last_resort=not options.unique)
+    lines = heapq.merge(*(_read_run(path) for path in paths), key=key, reverse=options.reverse)
+    if options.unique:
+        lines = _unique(lines, key)
+    return lines
+
+
+def _batches(lines):
+    """Lines as output chunks of OUTPUT_BATCH lines"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= OUTPUT_BATCH:
+            yield b"\n".join(batch) + b"\n"
+            batch = []
+    if batch:
+        yield b"\n".join(batch) + b"\n"
+
+
+def sort(term, *args, stdin=None):
+    """Sort lines of text, spilling to temporary files when they don't fit in memory"""
+    try:
+        options, files = parse_args(args)
+    except ValueError as e:
+        return term.error(f"sort: {e}\n{USAGE}", 2)
+    sources = []
+    for name in files:
+        try:
+            sources.append(open(os.path.join(term.current_dir, name), 'rb'))
+        except OSError as e:
+            for f in sources:
+                f.close()
+            return term.error(f"sort: cannot read: {name}: {e.strerror}", 2)
+    if not files and stdin is None:
+        return term.error(USAGE, 2)
+    return _sort(term, options, sources, stdin)
+
+
+def _blocks(sources, stdin):
+    """Byte blocks of each input in turn; None after each input"""
+    from pipeline import iter_bytes
+    if not sources:
+        yield from iter_bytes(stdin)
+        yield None
+    for f in sources:
+        with f:
+            yield from iter(lambda: f.read(READ_BLOCK), b"")
+        yield None
+
+
+def _sort(term, options, sources, stdin):
+    import tempfile
+    import shutil
+
+    parallel = options.parallel
+    budget = options.buffer
+    # Runs on the pool are held here and in a worker (see the module docstring)
+    run_size = budget if parallel == 1 else budget // (2 * parallel)
+    temp = None
+    pool = None
+    pending = []   # futures of runs being sorted
+    runs = []
+    lines = []
+    size = 0
+    leftover = b""
+
+    def spill():
+        """Sort the lines read so far into run files"""
+        nonlocal temp, pool, lines, size
+        if temp is None:
+            temp = tempfile.mkdtemp(prefix='winterm-sort-', dir=options.temp_dir)
+        path = os.path.join(temp, f"run{len(runs) + len(pending)}")
+        if parallel == 1 or not runs:
+            # The first, full buffer is sorted here, without copies
+            runs.append(sort_run(lines, options, path))
+        else:
+            if pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+                pool = ProcessPoolExecutor(parallel)
+            pending.append(pool.submit(sort_run, lines, options, path))
+            while len(pending) >= parallel:
+                runs.append(pending.pop(0).result())
+        lines = []
+        size = 0
+
+    def interrupted():
+        return term.error_line(f"sort: {term.cancel_token.reason}", 130)
+
+    try:
+        try:
+            for block in _blocks(sources, stdin):
+                if term.cancelled():
+                    yield interrupted()
+                    return
+                if block is None:
+                    # Each input's last line ends there, newline or not
+                    if leftover:
+                        lines.append(leftover)
+                        leftover = b""
+                    continue
+                parts = (leftover + block).split(b"\n")
+                leftover = parts.pop()
+                lines.extend(parts)
+                size += len(block) + LINE_OVERHEAD * len(parts)
+                if size >= (run_size if runs else budget):
+                    spill()
+        except OSError as e:
+            yield term.error_line(f"sort: read failed: {e.filename or '-'}: {e.strerror}", 2)
+            return
+
+        if not runs:
+            # It all fitted in memory
+            yield from _batches(sort_lines(lines, options))
+            return
+        if lines:
+            spill()
+        runs.extend(future.result() for future in pending)
+        pending = []
+
+        # Merge MERGE_FANIN runs at a time until one pass can produce the output
+        generation = 0
+        while len(runs) > MERGE_FANIN:
+            generation += 1
+            merged = []
+            for start in range(0, len(runs), MERGE_FANIN):
+                group = runs[start:start + MERGE_FANIN]
+                path = os.path.join(temp, f"merge{generation}-{start}")
+                with open(path, 'wb') as f:
+                    for chunk in _batches(merge(group, options)):
+                        f.write(chunk)
+                        if term.cancelled():
+                            yield interrupted()
+                            return
+                for done in group:
+                    os.remove(done)
+                merged.append(path)
+            runs = merged
+        for chunk in _batches(merge(runs, options)):
+            if term.cancelled():
+                yield interrupted()
+                return
+            yield chunk
+    finally:
+        for f in sources:
+            f.close()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if temp is not None:
+            shutil.rmtree(temp, ignore_errors=True)
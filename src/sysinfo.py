@@ -0,0 +1,165 @@
+"""System information commands: neofetch, df, ps"""
+import os
+import platform
+import psutil
+
+
+def neofetch(term, *args):
+    """Display system information"""
+    system_info = platform.uname()
+    
+    # Get CPU information
+    cpu_info = platform.processor()
+    if not cpu_info:
+        cpu_info = "Unknown"
+    
+    # Get memory information
+    memory = psutil.virtual_memory()
+    mem_total = memory.total / (1024**3)
+    mem_used = memory.used / (1024**3)
+    
+    # Get disk information
+    disk = psutil.disk_usage('/')
+    disk_total = disk.total / (1024**3)
+    disk_used = disk.used / (1024**3)
+    
+    info = f"""
+               {term.username}@{term.hostname}
+               ---------------
+               OS: {system_info.system} {system_info.release}
+               Kernel: {system_info.version.split('#')[0]}
+               Uptime: {_get_uptime()}
+               Shell: {os.environ.get('SHELL', 'Unknown')}
+               Terminal: {os.environ.get('TERM', 'Unknown')}
+               CPU: {cpu_info}
+               Memory: {mem_used:.1f}GiB / {mem_total:.1f}GiB
+               Disk: {disk_used:.1f}GiB / {disk_total:.1f}GiB
+        """
+    
+    # Add ASCII art based on OS
+    ascii_art = _get_ascii_art(system_info.system)
+    
+    return ascii_art + info
+
+
+def _get_uptime():
+    """Get system uptime"""
+    try:
+        with open('/proc/uptime', 'r') as f:
+            uptime_seconds = float(f.readline().split()[0])
+        
+        days = uptime_seconds // 86400
+        hours = (uptime_seconds % 86400) // 3600
+        minutes = (uptime_seconds % 3600) // 60
+        
+        if days > 0:
+            return f"{int(days)} days, {int(hours)} hours"
+        elif hours > 0:
+            return f"{int(hours)} hours, {int(minutes)} mins"
+        else:
+            return f"{int(minutes)} mins"
+    except:
+        return "Unknown"
+
+
+def _get_ascii_art(os_name):
+    """Get ASCII art for the OS"""
+    arts = {
+        "Linux": """
+                   .88888888:.
+                88888888.88888.
+              .8888888888888888.
+              888888888888888888
+              88' _`88'_  `88888
+              88 88 88 88  88888
+              88_88_::_88_:88888
+              88:::,::,:::::8888
+              88`:::::::::'`8888
+             .88  `::::'    8:88.
+            8888            `8:888.
+          .8888'             `888888.
+         .8888:..  .::.  ...:'8888888:.
+        .8888.'     :'     `'::`88:88888
+       .8888        '         `.888:8888.
+      888:8         .           888:88888
+    .888:88        .:           888:88888:
+    8888888.       ::           88:888888
+    `.::.888.      ::          .88888888
+   .::::::.888.    ::         :::`8888'.:.
+  ::::::::::.888   '         .::::::::::::
+  ::::::::::::.8    '      .:8::::::::::::.
+ .::::::::::::::.        .:888:::::::::::::
+ :::::::::::::::88:.__..:88888:::::::::::'
+  `'.:::::::::::88888888888.88:::::::::'
+        `':::_:' -- '' -'-' `':_::::'`
+            """,
+        "Windows": """
+            ⠀⠀⠀⣤⣴⣾⣿⣿⣿⣿⣿⣶⡄⠀⠀⠀⠀⠀⠀⠀⠀⠀⣠⡄
+⠀⠀⢀⣿⣿⣿⣿⣿⣿⣿⣿⣿⠀⠀⢰⣦⣄⣀⣀⣠⣴⣾⣿⠃
+⠀⠀⢸⣿⣿⣿⣿⣿⣿⣿⣿⡏⠀⠀⣼⣿⣿⣿⣿⣿⣿⣿⣿⠀
+⠀⠀⣼⣿⡿⠿⠛⠻⠿⣿⣿⡇⠀⠀⣿⣿⣿⣿⣿⣿⣿⣿⡿⠀
+⠀⠀⠉⠀⠀⠀⢀⠀⠀⠀⠈⠁⠀⢰⣿⣿⣿⣿⣿⣿⣿⣿⠇⠀
+⠀⠀⣠⣴⣶⣿⣿⣿⣷⣶⣤⠀⠀⠀⠈⠉⠛⠛⠛⠉⠉⠀⠀⠀
+⠀⢸⣿⣿⣿⣿⣿⣿⣿⣿⡇⠀⠀⣶⣦⣄⣀⣀⣀⣤⣤⣶⠀⠀
+⠀⣾⣿⣿⣿⣿⣿⣿⣿⣿⡇⠀⢀⣿⣿⣿⣿⣿⣿⣿⣿⡟⠀⠀
+⠀⣿⣿⣿⣿⣿⣿⣿⣿⣿⠁⠀⢸⣿⣿⣿⣿⣿⣿⣿⣿⡇⠀⠀
+⢠⣿⡿⠿⠛⠉⠉⠉⠛⠿⠀⠀⢸⣿⣿⣿⣿⣿⣿⣿⣿⠁⠀⠀
+⠘⠉⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠻⢿⣿⣿⣿⣿⣿⠿⠛⠀⠀⠀
+        """,
+        "Darwin": """
+                    c.'
+                 ,xNMM.
+               .OMMMMo
+               lMM"
+     .;loddo:.  .olloddol;.
+   cKMMMMMMMMMMNWMMMMMMMMMM0:
+ .KMMMMMMMMMMMMMMMMMMMMMMMWd.
+ XMMMMMMMMMMMMMMMMMMMMMMMX.
+;MMMMMMMMMMMMMMMMMMMMMMMMM:
+:MMMMMMMMMMMMMMMMMMMMMMMMM:
+.MMMMMMMMMMMMMMMMMMMMMMMMX.
+ kMMMMMMMMMMMMMMMMMMMMMMMMWd.
+ 'XMMMMMMMMMMMMMMMMMMMMMMMMMMk
+  'XMMMMMMMMMMMMMMMMMMMMMMMMK.
+    kMMMMMMMMMMMMMMMMMMMMMMd
+     ;KMMMMMMMWXXWMMMMMMMk.
+       "cooc*"    "*coo'"
+            """
+    }
+    
+    return arts.get(os_name, """
+            OS not recognized
+               ⠀⠀⠀⠀
+        """)
+
+
+def df(term, *args):
+    """Display disk space usage"""
+    partitions = psutil.disk_partitions()
+    output = ["Filesystem      Size  Used  Avail  Use%  Mounted on"]
+    
+    for partition in partitions:
+        try:
+            usage = psutil.disk_usage(partition.mountpoint)
+            size_gb = usage.total / (1024**3)
+            used_gb = usage.used / (1024**3)
+            avail_gb = usage.free / (1024**3)
+            percent = usage.percent
+            
+            output.append(f"{partition.device[:14]:14} {size_gb:4.1f}G {used_gb:4.1f}G {avail_gb:4.1f}G {percent:4.0f}%  {partition.mountpoint}")
+        except:
+            continue
+    
+    return "\n".join(output)
+
+
+def ps(term, *args):
+    """Display process status"""
+    output = ["PID    CMD"]
+    for proc in psutil.process_iter(['pid', 'name']):
+        try:
+            output.append(f"{proc.info['pid']:<6} {proc.info['name']}")
+        except:
+            continue
+    
+    return "\n".join(output[:20])  # Show first 20 processes
@@ -0,0 +1,446 @@
+"""grep built-in: regex search over files, directories and pipeline input
+
+Files are read in binary and matched with a bytes regex, so only matching
+lines are ever decoded. Large files are split into segments on line
+boundaries; once there is enough work, segments are searched on a pool of
+processes (all cores, no GIL) while results are still printed in order.
+At most a few segments per worker are in flight, so memory stays bounded
+however much is searched.
+
+Literal patterns (-F, or no regex metacharacters) take a faster path: the
+file is memory-mapped and searched with bytes.find (or a bytes regex for
+-i and several patterns) across the whole mapping, and only the lines
+around each hit are sliced out and decoded.
+"""
+import itertools
+import mmap
+import os
+import re
+import stat
+
+USAGE = "Usage: grep [-rivclnFEHh] [-e pattern] pattern [file...]"
+SEGMENT_SIZE = 32 * 1024 * 1024
+POOL_THRESHOLD = 64 * 1024 * 1024  # bytes to search before starting worker processes
+BINARY_PROBE = 8192
+REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+
+# What a search needs to report; PROBE is LINES for input that can only be
+# read once, which is checked for binary data as it is searched
+LINES, COUNT, FIRST, PROBE = 0, 1, 2, 3
+
+
+class Options:
+    """Parsed grep command line"""
+    def __init__(self):
+        self.patterns = []
+        self.ignore_case = False
+        self.invert = False
+        self.count = False
+        self.files_with_matches = False
+        self.line_numbers = False
+        self.recursive = False
+        self.fixed = False
+        self.filenames = None  # None: only when searching more than one file
+
+
+def parse_args(args):
+    """Return (Options, files); raises ValueError on bad arguments"""
+    options = Options()
+    files = []
+    args = list(args)
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg == '--':
+            files.extend(args[i:])
+            break
+        if arg == '-e' or arg == '--regexp':
+            if i >= len(args):
+                raise ValueError(f"option '{arg}' requires an argument")
+            options.patterns.append(args[i])
+            i += 1
+        elif arg.startswith('-') and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag == 'i':
+                    options.ignore_case = True
+                elif flag == 'v':
+                    options.invert = True
+                elif flag == 'c':
+                    options.count = True
+                elif flag == 'l':
+                    options.files_with_matches = True
+                elif flag == 'n':
+                    options.line_numbers = True
+                elif flag in 'rR':
+                    options.recursive = True
+                elif flag == 'F':
+                    options.fixed = True
+                elif flag == 'E':
+                    options.fixed = False
+                elif flag == 'H':
+                    options.filenames = True
+                elif flag == 'h':
+                    options.filenames = False
+                else:
+                    raise ValueError(f"invalid option -- '{flag}'")
+        elif not options.patterns:
+            options.patterns.append(arg)
+        else:
+            files.append(arg)
+    if not options.patterns:
+        raise ValueError("no pattern given")
+    return options, files
+
+
+class Matcher:
+    """The pattern(s) compiled for both bytes (files) and str (pipeline input)"""
+    def __init__(self, options, encoding):
+        expressions = [re.escape(p) if options.fixed else p for p in options.patterns]
+        expression = expressions[0] if len(expressions) == 1 else "|".join(f"(?:{e})" for e in expressions)
+        flags = re.IGNORECASE if options.ignore_case else 0
+        self.text = re.compile(expression, flags)
+        # Case-folding on bytes is ASCII-only, so other -i patterns match decoded text
+        self.binary = None
+        if expression.isascii() or not options.ignore_case:
+            try:
+                self.binary = re.compile(expression.encode(encoding), flags)
+            except (UnicodeEncodeError, re.error):
+                pass
+        self.encoding = encoding
+        self.invert = options.invert
+
+        # Fixed strings can be searched for across a whole mapped file
+        self.literal = None        # bytes for bytes.find
+        self.literal_regex = None  # bytes regex of literals (-i, several patterns)
+        literals = options.fixed or not any(REGEX_SPECIAL & set(p) for p in options.patterns)
+        if literals and self.binary is not None and not any("\n" in p for p in options.patterns):
+            if len(options.patterns) == 1 and not options.ignore_case:
+                self.literal = options.patterns[0].encode(encoding)
+            else:
+                self.literal_regex = re.compile(
+                    b"|".join(re.escape(p.encode(encoding)) for p in options.patterns), flags)
+
+    def bytes_search(self):
+        """A function telling whether a line (bytes) is selected"""
+        invert = self.invert
+        if self.binary is not None:
+            search = self.binary.search
+        else:
+            text_search, encoding = self.text.search, self.encoding
+            search = lambda line: text_search(line.decode(encoding, 'replace'))
+        if invert:
+            return lambda line: search(line) is None
+        return lambda line: search(line) is not None
+
+
+def search_segment(path, start, end, matcher, mode, count_lines=True):
+    """Search the lines of path that start in [start, end) (end None: to EOF)
+
+    Returns (lines read, selected count, [(line number in segment, bytes)]);
+    in PROBE mode the matches are None if the input turned out to be binary.
+    Runs in worker processes, so everything here must be picklable.
+    With count_lines=False the literal fast path doesn't count lines, and
+    returns 0 for the lines read and 1 for every line number.
+    """
+    if end is not None and not matcher.invert and (
+            matcher.literal is not None or matcher.literal_regex is not None):
+        try:
+            return search_mapped(path, start, end, matcher, mode, count_lines)
+        except ValueError:
+            pass  # empty file, or not mappable (a pipe, /proc)
+    selected = matcher.bytes_search()
+    count = 0
+    matches = []
+    number = 0
+    with open(path, 'rb') as f:
+        if start:
+            # A line belongs to the segment it starts in
+            f.seek(start - 1)
+            if f.read(1) != b"\n":
+                f.readline()
+        lines = f
+        binary = False
+        if mode == PROBE:
+            # Probe the data being searched: a pipe can't be read twice
+            head = f.read(BINARY_PROBE)
+            binary = b"\0" in head
+            mode = FIRST if binary else LINES
+            lines = itertools.chain((head + f.readline()).splitlines(keepends=True), f)
+        position = f.tell() if end is not None else 0
+        for line in lines:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            number += 1
+            if selected(line):
+                count += 1
+                if mode == LINES:
+                    matches.append((number, line))
+                elif mode == FIRST:
+                    break
+    return number, count, None if binary else matches
+
+
+def search_mapped(path, start, end, matcher, mode, count_lines=True):
+    """search_segment() for literal patterns over a memory-mapped file"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        size = len(data)
+        # Widen [start, end) to the lines that start inside it
+        if start and data[start - 1] != 0x0a:
+            start = data.find(b"\n", start) + 1 or size
+        if end < size and data[end - 1] != 0x0a:
+            end = data.find(b"\n", end) + 1 or size
+        end = min(end, size)
+
+        if matcher.literal is not None:
+            needle = matcher.literal
+            find = lambda position: data.find(needle, position, end)
+        else:
+            search = matcher.literal_regex.search
+
+            def find(position):
+                match = search(data, position, end)
+                return match.start() if match else -1
+
+        count = 0
+        matches = []
+        newlines = 0     # in data[start:counted]
+        counted = start
+        position = start
+        while True:
+            hit = find(position)
+            if hit < 0:
+                break
+            line_start = data.rfind(b"\n", start, hit) + 1 or start
+            line_end = data.find(b"\n", hit, end)
+            line_end = end if line_end < 0 else line_end + 1
+            count += 1
+            if mode == LINES:
+                if count_lines:
+                    newlines += data[counted:line_start].count(b"\n")
+                    counted = line_start
+                matches.append((newlines + 1, data[line_start:line_end]))
+            elif mode == FIRST:
+                break
+            position = line_end
+        lines = 0
+        if count_lines and end > start:
+            lines = newlines + data[counted:end].count(b"\n") + (data[end - 1] != 0x0a)
+    return lines, count, matches
+
+
+def _segments(path, size):
+    if not size:
+        # Pipes, devices and files that stat as empty (/proc, sysfs)
+        return [(0, None)]
+    if size <= SEGMENT_SIZE:
+        return [(0, size)]
+    return [(start, min(start + SEGMENT_SIZE, size)) for start in range(0, size, SEGMENT_SIZE)]
+
+
+def grep(term, *args, stdin=None):
+    """Search text using patterns"""
+    try:
+        options, files = parse_args(args)
+    except ValueError as e:
+        return term.error(f"grep: {e}\n{USAGE}", 2)
+    import pipeline
+    try:
+        matcher = Matcher(options, pipeline.text_encoding())
+    except re.error as e:
+        return term.error(f"grep: invalid pattern: {e}", 2)
+    if not files:
+        if stdin is None and not options.recursive:
+            return term.error(USAGE, 2)
+        if stdin is not None:
+            return _grep_stream(term, options, matcher, stdin)
+        files = ['.']
+    return _grep_files(term, options, matcher, files)
+
+
+def _grep_stream(term, options, matcher, stdin):
+    """Search pipeline input line by line"""
+    from pipeline import iter_lines
+
+    search = matcher.text.search
+    invert = options.invert
+    count = 0
+    for number, line in enumerate(iter_lines(stdin), 1):
+        if (search(line) is None) != invert:
+            continue
+        count += 1
+        if options.files_with_matches:
+            yield "(standard input)\n"
+            break
+        if not options.count:
+            line = line.rstrip("\r\n")
+            yield f"{number}:{line}\n" if options.line_numbers else line + "\n"
+        if term.cancelled():
+            break
+    if options.count:
+        yield f"{count}\n"
+    term.last_status = 0 if count else 1
+
+
+def _files(term, options, names, errors):
+    """Yield (display name, path, size) of the files to search, in order"""
+    from walker import Walker
+
+    for name in names:
+        path = os.path.join(term.current_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            errors.append(f"grep: {name}: {e.strerror}")
+            continue
+        if not os.path.isdir(path):
+            yield name, path, st.st_size if stat.S_ISREG(st.st_mode) else None
+            continue
+        if not options.recursive:
+            errors.append(f"grep: {name}: Is a directory")
+            continue
+        cut = len(path)
+        for directory in Walker(path, ordered=True, sort=lambda entries: sorted(entries, key=lambda e: e.name),
+                                cancelled=term.cancelled):
+            if directory.error is not None:
+                errors.append(f"grep: {name + directory.path[cut:]}: {directory.error.strerror}")
+            for entry in directory.entries:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        yield name + entry.path[cut:], entry.path, entry.stat().st_size
+                except OSError:
+                    pass
+
+
+def _is_binary(path):
+    try:
+        with open(path, 'rb') as f:
+            return b"\0" in f.read(BINARY_PROBE)
+    except OSError:
+        return False
+
+
+def _tasks(term, options, names, errors):
+    """Yield (number, name, path, start, end, mode) segments for every file to search
+
+    number counts the files in order, so a file named twice is searched twice.
+    """
+    if options.count:
+        mode = COUNT
+    elif options.files_with_matches:
+        mode = FIRST
+    else:
+        mode = LINES
+    for number, (name, path, size) in enumerate(_files(term, options, names, errors)):
+        file_mode = mode
+        if mode == LINES:
+            if size is None:
+                file_mode = PROBE
+            elif _is_binary(path):
+                file_mode = FIRST
+        for start, end in _segments(path, size):
+            yield number, name, path, start, end, file_mode
+
+
+def _run(term, tasks, matcher, count_lines):
+    """Search segments in order: inline at first, then on a process pool
+
+    Yields ((number, name, path, start, end, mode), result) in task order.
+    """
+    from collections import deque
+
+    workers = os.cpu_count() or 1
+    pool = None
+    pending = deque()
+    scheduled = 0
+    try:
+        for task in tasks:
+            number, name, path, start, end, mode = task
+            scheduled += (end - start) if end is not None else SEGMENT_SIZE
+            if pool is None and workers > 1 and scheduled > POOL_THRESHOLD:
+                from concurrent.futures import ProcessPoolExecutor
+                pool = ProcessPoolExecutor(workers)
+            if pool is None:
+                try:
+                    yield task, search_segment(path, start, end, matcher, mode, count_lines)
+                except OSError as e:
+                    yield task, e
+            else:
+                pending.append((task, pool.submit(search_segment, path, start, end, matcher, mode, count_lines)))
+                while len(pending) >= workers * 2:
+                    task, future = pending.popleft()
+                    yield task, _result(future)
+            if term.cancelled():
+                return
+        while pending and not term.cancelled():
+            task, future = pending.popleft()
+            yield task, _result(future)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _result(future):
+    try:
+        return future.result()
+    except OSError as e:
+        return e
+
+
+def _grep_files(term, options, matcher, names):
+    errors = []
+    show_names = options.filenames
+    if show_names is None:
+        show_names = options.recursive or len(names) > 1
+    encoding = matcher.encoding
+
+    found = False
+    current = None   # number of the file being reported
+    line_base = 0    # lines in the file's earlier segments
+    file_count = 0
+    done = False     # nothing more to report for the current file
+    for task, result in _run(term, _tasks(term, options, names, errors), matcher, options.line_numbers):
+        number, name, path, start, end, mode = task
+        if number != current:
+            if current is not None and options.count:
+                yield f"{current_name}:{file_count}\n" if show_names else f"{file_count}\n"
+            current, current_name = number, name
+            line_base = file_count = 0
+            done = False
+        if errors:
+            yield "".join(term.error_line(message, 2) for message in errors)
+            errors.clear()
+        if isinstance(result, OSError):
+            yield term.error_line(f"grep: {name}: {result.strerror}", 2)
+            done = True
+            continue
+        if done:
+            continue
+        lines, count, matches = result
+        file_count += count
+        if count:
+            found = True
+        if (mode == FIRST or matches is None) and count:
+            done = True
+            if options.files_with_matches:
+                yield f"{name}\n"
+            elif not options.count:
+                yield f"Binary file {name} matches\n"
+        elif matches:
+            out = []
+            prefix = f"{name}:" if show_names else ""
+            for number, line in matches:
+                text = line.decode(encoding, 'replace').rstrip("\r\n")
+                if options.line_numbers:
+                    out.append(f"{prefix}{line_base + number}:{text}\n")
+                else:
+                    out.append(f"{prefix}{text}\n")
+            yield "".join(out)
+        line_base += lines
+    if current is not None and options.count:
+        yield f"{current_name}:{file_count}\n" if show_names else f"{file_count}\n"
+    if errors:
+        yield "".join(term.error_line(message, 2) for message in errors)
+    if term.last_status != 2:
+        term.last_status = 0 if found else 1
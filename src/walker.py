@@ -0,0 +1,263 @@
+"""Parallel directory tree walker shared by du, find and ls -R
+
+Directories are read with os.scandir by a small pool of threads. stat()
+releases the GIL, so on network filesystems (NFS, SMB) many directory
+reads and stats are in flight at once instead of one round trip at a
+time. Results stream back through a bounded queue as Directory objects
+whose os.DirEntry items already have their stat results cached.
+"""
+import os
+import queue
+import threading
+
+WORKERS = min(16, (os.cpu_count() or 1) * 2)
+QUEUE_SIZE = 64
+PREFETCH = 4  # directories read ahead per worker in ordered mode
+
+_DONE = object()
+
+
+class Directory:
+    """One scanned directory: path, depth (the root is 0), entries and error
+
+    error is the OSError that stopped the directory from being read, in
+    which case entries is empty. reused is True when the `reuse` callback
+    supplied the subdirectories and the directory was not read at all.
+    results holds the values returned by the `visit` callback.
+    """
+    __slots__ = ('path', 'depth', 'entries', 'error', 'reused', 'results')
+
+    def __init__(self, path, depth, entries=(), error=None, reused=False, results=()):
+        self.path = path
+        self.depth = depth
+        self.entries = entries
+        self.error = error
+        self.reused = reused
+        self.results = results
+
+
+class _Slot:
+    """A directory of an ordered walk and, once read, its _scan() result"""
+    __slots__ = ('path', 'depth', 'done', 'result')
+
+    def __init__(self, path, depth):
+        self.path = path
+        self.depth = depth
+        self.done = None    # Event, created when the read is scheduled
+        self.result = None
+
+
+class Walker:
+    """Iterate over the directories of a tree, reading them in parallel
+
+    max_depth      entries deeper than this are not reported (the root's
+                   entries are at depth 1); None walks the whole tree
+    follow_symlinks descend into symlinked directories (loops are skipped)
+    one_filesystem don't descend into other filesystems (like `du -x`)
+    stat           stat every entry in the worker threads
+    sort           callable applied to each directory's entry list
+    ordered        yield directories in depth-first pre-order (children in
+                   entry order) instead of as soon as they are read
+    cancelled      callable checked between directories; stops the walk
+    reuse          callable(path) run in the worker threads; if it returns a
+                   list of subdirectory paths the directory isn't read and
+                   the walk continues into those instead
+    visit          callable(entry, depth) run in the worker threads for every
+                   entry; returns (result, descend). Results other than None
+                   are collected in Directory.results, and a directory is
+                   only walked into if descend is true (e.g. find -prune)
+    """
+    def __init__(self, root, max_depth=None, follow_symlinks=False, one_filesystem=False,
+                 stat=False, sort=None, ordered=False, workers=WORKERS, cancelled=None,
+                 reuse=None, visit=None):
+        self.root = root
+        self.max_depth = max_depth
+        self.follow_symlinks = follow_symlinks
+        self.one_filesystem = one_filesystem
+        self.stat = stat
+        self.sort = sort
+        self.ordered = ordered
+        self.workers = max(1, workers)
+        self.cancelled = cancelled
+        self.reuse = reuse
+        self.visit = visit
+        self.device = None
+        self.seen = set()   # (st_dev, st_ino) of directories, when following symlinks
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def __iter__(self):
+        if self.max_depth is not None and self.max_depth < 1:
+            return iter(())
+        if self.one_filesystem or self.follow_symlinks:
+            try:
+                st = os.stat(self.root)
+                self.device = st.st_dev
+                self.seen.add((st.st_dev, st.st_ino))
+            except OSError:
+                pass  # reported when the root is scanned
+        return self._ordered() if self.ordered else self._unordered()
+
+    def _scan(self, path, depth):
+        """Read one directory; returns (Directory, paths of subdirectories to walk)"""
+        descend = self.max_depth is None or depth + 1 < self.max_depth
+        if self.reuse is not None:
+            subdirs = self.reuse(path)
+            if subdirs is not None:
+                return Directory(path, depth, reused=True), subdirs if descend else []
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError as e:
+            return Directory(path, depth, error=e), []
+
+        if self.stat:
+            for entry in entries:
+                try:
+                    entry.stat(follow_symlinks=False)  # cached on the entry
+                except OSError:
+                    pass
+        if self.sort is not None:
+            entries = self.sort(entries)
+        results = ()
+        pruned = ()
+        if self.visit is not None:
+            results = []
+            pruned = set()
+            for entry in entries:
+                result, walk_into = self.visit(entry, depth + 1)
+                if result is not None:
+                    results.append(result)
+                if not walk_into:
+                    pruned.add(entry.name)
+
+        subdirs = []
+        if descend:
+            for entry in entries:
+                if entry.name in pruned:
+                    continue
+                try:
+                    if not entry.is_dir(follow_symlinks=self.follow_symlinks):
+                        continue
+                    if self.one_filesystem or self.follow_symlinks:
+                        st = entry.stat()
+                        if self.one_filesystem and st.st_dev != self.device:
+                            continue
+                        if self.follow_symlinks:
+                            key = (st.st_dev, st.st_ino)
+                            with self.lock:
+                                if key in self.seen:
+                                    continue  # symlink loop or already walked
+                                self.seen.add(key)
+                except OSError:
+                    continue
+                subdirs.append(entry.path)
+        return Directory(path, depth, entries, results=results), subdirs
+
+    def _put(self, results, item):
+        """Put into a bounded queue without blocking past a stop()"""
+        while not self.stopped.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _start(self, target):
+        threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=target, name=f"walker-{i + 1}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _unordered(self):
+        tasks = queue.Queue()   # (path, depth) waiting to be read
+        results = queue.Queue(QUEUE_SIZE)
+        pending = [1]           # directories queued or being read
+
+        def work():
+            while True:
+                task = tasks.get()
+                if task is None:
+                    return
+                if self.stopped.is_set():
+                    continue
+                try:
+                    directory, subdirs = self._scan(*task)
+                except Exception as e:
+                    self._put(results, e)
+                    continue
+                with self.lock:
+                    pending[0] += len(subdirs)
+                for path in subdirs:
+                    tasks.put((path, directory.depth + 1))
+                self._put(results, directory)
+                with self.lock:
+                    pending[0] -= 1
+                    done = pending[0] == 0
+                if done:
+                    self._put(results, _DONE)
+
+        tasks.put((self.root, 0))
+        threads = self._start(work)
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                if self.cancelled is not None and self.cancelled():
+                    break
+        finally:
+            self.stopped.set()
+            for _ in threads:
+                tasks.put(None)
+
+    def _ordered(self):
+        tasks = queue.Queue()
+
+        def schedule(slot):
+            slot.done = threading.Event()
+            tasks.put(slot)
+
+        def work():
+            while True:
+                slot = tasks.get()
+                if slot is None:
+                    return
+                try:
+                    if not self.stopped.is_set():
+                        slot.result = self._scan(slot.path, slot.depth)
+                except Exception as e:
+                    slot.result = e
+                finally:
+                    slot.done.set()
+
+        threads = self._start(work)
+        stack = [_Slot(self.root, 0)]
+        window = self.workers * PREFETCH
+        try:
+            while stack:
+                slot = stack.pop()
+                if slot.done is None:
+                    schedule(slot)
+                slot.done.wait()
+                if isinstance(slot.result, Exception):
+                    raise slot.result
+                directory, subdirs = slot.result
+                yield directory
+                if self.cancelled is not None and self.cancelled():
+                    break
+                stack.extend(_Slot(path, slot.depth + 1) for path in reversed(subdirs))
+                # Start reading the directories that will be visited next
+                for upcoming in stack[:-window - 1:-1]:
+                    if upcoming.done is None:
+                        schedule(upcoming)
+        finally:
+            self.stopped.set()
+            for _ in threads:
+                tasks.put(None)
+
@@ -0,0 +1,289 @@
+"""wc built-in: line, word, character and byte counts
+
+Input is read in CHUNK_SIZE blocks and counted with bytes methods that run
+in C instead of a Python loop per line: bytes.count(b"\n") for lines, a
+translate() to two symbols (space or not) and a count of b" x" for the
+starts of words, and for UTF-8 text the bytes that don't begin a character
+are dropped with translate() for -m. A word split across two blocks is
+counted once because each block remembers whether it starts and ends
+inside a word. A regular file's byte count alone comes from stat().
+
+Big files are cut into segments that are counted independently and then
+added up. As with grep, once there is enough work the segments are
+counted on a pool of processes, and results are still printed in order.
+"""
+import os
+import stat
+
+USAGE = "Usage: wc [-lwmc] [file...]"
+CHUNK_SIZE = 1024 * 1024
+SEGMENT_SIZE = 32 * 1024 * 1024
+POOL_THRESHOLD = 64 * 1024 * 1024  # bytes to count before starting worker processes
+
+# Whitespace as bytes.split() and GNU wc in the C locale see it
+WORD_TABLE = bytes(0x20 if chr(b) in " \t\n\r\x0b\x0c" else 0x78 for b in range(256))
+UTF8_CONTINUATION = bytes(range(0x80, 0xc0))
+
+
+class Counts:
+    """Counts for a stretch of input; added together in input order"""
+    __slots__ = ('lines', 'words', 'chars', 'bytes', 'starts_in_word', 'ends_in_word')
+
+    def __init__(self, lines=0, words=0, chars=0, nbytes=0, starts_in_word=False, ends_in_word=False):
+        self.lines = lines
+        self.words = words
+        self.chars = chars
+        self.bytes = nbytes
+        self.starts_in_word = starts_in_word
+        self.ends_in_word = ends_in_word
+
+    def add(self, other, joined=True):
+        """Add the counts of the input that follows (joined) or of another file"""
+        if not other.bytes:
+            return
+        if not self.bytes:
+            self.starts_in_word = other.starts_in_word
+        self.lines += other.lines
+        # A word running across the boundary was counted on both sides
+        self.words += other.words - (joined and self.ends_in_word and other.starts_in_word)
+        self.chars += other.chars
+        self.bytes += other.bytes
+        self.ends_in_word = other.ends_in_word
+
+
+def count_chunks(chunks, words=True, encoding=None):
+    """Count an iterable of bytes; words only if asked, characters given an encoding"""
+    import codecs
+    utf8 = encoding is not None and codecs.lookup(encoding).name == 'utf-8'
+    decoder = None
+    if encoding is not None and not utf8:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    total = Counts()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        counts = Counts(chunk.count(b"\n"), nbytes=len(chunk))
+        if words:
+            symbols = chunk.translate(WORD_TABLE)
+            counts.starts_in_word = symbols[0] == 0x78
+            counts.ends_in_word = symbols[-1] == 0x78
+            counts.words = symbols.count(b" x") + counts.starts_in_word
+        if utf8:
+            counts.chars = len(chunk.translate(None, UTF8_CONTINUATION))
+        elif decoder is not None:
+            counts.chars = len(decoder.decode(chunk))
+        total.add(counts)
+    return total
+
+
+def count_segment(path, start, end, words=True, encoding=None):
+    """Count bytes start..end of a file (end None: to the end of the file)"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start if end is not None else None
+
+        def chunks():
+            nonlocal remaining
+            while remaining is None or remaining > 0:
+                data = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not data:
+                    return
+                if remaining is not None:
+                    remaining -= len(data)
+                yield data
+        return count_chunks(chunks(), words, encoding)
+
+
+class Options:
+    """Parsed wc command line"""
+    def __init__(self):
+        self.lines = False
+        self.words = False
+        self.chars = False
+        self.bytes = False
+
+    def columns(self):
+        if not (self.lines or self.words or self.chars or self.bytes):
+            self.lines = self.words = self.bytes = True
+        return [name for name in ('lines', 'words', 'chars', 'bytes') if getattr(self, name)]
+
+
+def parse_args(args):
+    """Return (Options, files); raises ValueError on bad arguments"""
+    options = Options()
+    names = {'l': 'lines', 'w': 'words', 'm': 'chars', 'c': 'bytes'}
+    long_names = {'--lines': 'lines', '--words': 'words', '--chars': 'chars', '--bytes': 'bytes'}
+    files = []
+    for arg in args:
+        if arg in long_names:
+            setattr(options, long_names[arg], True)
+        elif arg.startswith('--'):
+            raise ValueError(f"unrecognized option '{arg}'")
+        elif arg.startswith('-') and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag not in names:
+                    raise ValueError(f"invalid option -- '{flag}'")
+                setattr(options, names[flag], True)
+        else:
+            files.append(arg)
+    return options, files
+
+
+def _format(counts, columns, width, name=None):
+    line = " ".join(str(getattr(counts, column)).rjust(width) for column in columns)
+    return f"{line} {name}\n" if name is not None else line + "\n"
+
+
+def wc(term, *args, stdin=None):
+    """Count lines, words, characters and bytes"""
+    try:
+        options, files = parse_args(args)
+    except ValueError as e:
+        return term.error(f"wc: {e}\n{USAGE}")
+    columns = options.columns()
+    encoding = None
+    if options.chars:
+        import pipeline
+        encoding = pipeline.text_encoding()
+    if not files:
+        if stdin is None:
+            return term.error(USAGE)
+        from pipeline import iter_bytes
+        counts = count_chunks(iter_bytes(stdin), options.words, encoding)
+        return _format(counts, columns, 1 if len(columns) == 1 else 7).rstrip("\n")
+    return _wc_files(term, files, columns, options.words, encoding)
+
+
+def _tasks(term, files, columns, errors):
+    """Yield (index, name, path, start, end, size) segments, size set when stat() answers it all
+
+    index is the operand's position, so a file named twice is counted twice.
+    """
+    stat_only = columns == ['bytes']
+    for index, name in enumerate(files):
+        path = os.path.join(term.current_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            errors.append(f"wc: {name}: {e.strerror}")
+            continue
+        if stat.S_ISDIR(st.st_mode):
+            errors.append(f"wc: {name}: Is a directory")
+            continue
+        if not stat.S_ISREG(st.st_mode):
+            yield index, name, path, 0, None, None
+            continue
+        if stat_only:
+            yield index, name, path, 0, 0, st.st_size
+            continue
+        starts = range(0, st.st_size, SEGMENT_SIZE) if st.st_size else [0]
+        for start in starts:
+            # The last segment reads to the end, in case the file has grown
+            end = start + SEGMENT_SIZE if start + SEGMENT_SIZE < st.st_size else None
+            yield index, name, path, start, end, None
+
+
+def _run(term, tasks, words, encoding):
+    """Count segments in order: inline at first, then on a process pool
+
+    Yields (task, Counts or OSError) in task order.
+    """
+    from collections import deque
+
+    workers = os.cpu_count() or 1
+    pool = None
+    pending = deque()
+    scheduled = 0
+    try:
+        for task in tasks:
+            index, name, path, start, end, size = task
+            if size is not None:
+                yield task, Counts(nbytes=size)
+                continue
+            scheduled += (end - start) if end is not None else SEGMENT_SIZE
+            if pool is None and workers > 1 and scheduled > POOL_THRESHOLD:
+                from concurrent.futures import ProcessPoolExecutor
+                pool = ProcessPoolExecutor(workers)
+            if pool is None:
+                try:
+                    yield task, count_segment(path, start, end, words, encoding)
+                except OSError as e:
+                    yield task, e
+            else:
+                pending.append((task, pool.submit(count_segment, path, start, end, words, encoding)))
+                while len(pending) >= workers * 2:
+                    task, future = pending.popleft()
+                    yield task, _result(future)
+            if term.cancelled():
+                return
+        while pending and not term.cancelled():
+            task, future = pending.popleft()
+            yield task, _result(future)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _result(future):
+    try:
+        return future.result()
+    except OSError as e:
+        return e
+
+
+def _width(term, files, columns):
+    """Column width, like GNU wc: enough digits for the files' total size"""
+    if len(files) == 1 and len(columns) == 1:
+        return 1
+    total = 0
+    for name in files:
+        try:
+            st = os.stat(os.path.join(term.current_dir, name))
+        except OSError:
+            continue
+        if not stat.S_ISREG(st.st_mode) and not stat.S_ISDIR(st.st_mode):
+            return 7  # size unknown
+        total += st.st_size
+    return len(str(total))
+
+
+def _wc_files(term, files, columns, words, encoding):
+    errors = []
+    width = _width(term, files, columns)
+    total = Counts()
+    current = None   # (index, name) of the operand being counted
+    counts = None
+    failed = False
+    out = []
+    for task, result in _run(term, _tasks(term, files, columns, errors), words, encoding):
+        index, name, path, start, end, size = task
+        if (index, name) != current:
+            if current is not None and not failed:
+                out.append(_format(counts, columns, width, current[1]))
+                total.add(counts, joined=False)
+            current = (index, name)
+            counts = Counts()
+            failed = False
+        if errors:
+            out.extend(term.error_line(message) for message in errors)
+            errors.clear()
+        if failed:
+            continue
+        if isinstance(result, OSError):
+            out.append(term.error_line(f"wc: {name}: {result.strerror}"))
+            failed = True
+            continue
+        counts.add(result)
+        if len(out) >= 1000:
+            yield "".join(out)
+            out = []
+    if current is not None and not failed:
+        out.append(_format(counts, columns, width, current[1]))
+        total.add(counts, joined=False)
+    out.extend(term.error_line(message) for message in errors)
+    if len(files) > 1:
+        out.append(_format(total, columns, width, "total"))
+    if term.cancelled():
+        out.append(term.error_line(f"wc: {term.cancel_token.reason}", 130))
+    if out:
+        yield "".join(out)